@@ -1,10 +1,19 @@
-import dsgrn_utilities.graphtranslation
-import dsgrn_utilities.get_parameter_neighbors
-import dsgrn_utilities.network_distance
-import dsgrn_utilities.network2logicfile
-import dsgrn_utilities.parameter_building
-import dsgrn_utilities.select_boolean_params
-import dsgrn_utilities.hillmodel
-import dsgrn_utilities.pattern_match_single_param
-
-__all__ = ["graphtranslation","get_parameter_neighbors","network_distance","network2logicfile","parameter_building","select_boolean_params","hillmodel","pattern_match_single_param"]
\ No newline at end of file
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562) so that "import dsgrn_utilities" stays cheap.
+# Modules such as hillmodel and graphtranslation pull in scipy, matplotlib and networkx, which worker processes
+# that only need network_distance or parameter_building should not pay for.
+
+__all__ = ["graphtranslation","get_parameter_neighbors","network_distance","network2logicfile","parameter_building","select_boolean_params","hillmodel","pattern_match_single_param","sample_hill_parameters","network_store","network_cache","npy_appender"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module("." + name, __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
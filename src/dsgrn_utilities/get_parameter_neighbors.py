@@ -4,6 +4,12 @@
 import DSGRN
 import dsgrn_utilities.select_boolean_params as sbp
 import dsgrn_utilities.network2logicfile as netlogic
+from dsgrn_utilities import network_cache
+
+
+def _network(net_spec):
+    # DSGRN Network objects are not modified after construction, so they are shared through network_cache
+    return network_cache.cached("dsgrn_network", net_spec, lambda : DSGRN.Network(net_spec))
 
 
 def is_essential(dsgrn_parameter):
@@ -59,7 +65,7 @@ def get_essential_parameter_neighbors(parametergraph):
         print("Essential network. Not computing neighbors.")
         return [], []
     # Get list of indices of essential parameters and its neighbors embedded in the parameter graph of the original network
-    ess_parametergraph = DSGRN.ParameterGraph(DSGRN.Network(ess_net_spec))
+    ess_parametergraph = DSGRN.ParameterGraph(_network(ess_net_spec))
     ess_par_indices = []      # Essential parameter indices
     ess_par_neighbors = set() # Neighbors of essential parameters
     for ess_pindex in range(ess_parametergraph.size()):
@@ -91,7 +97,7 @@ def get_parameter_neighbors_from_list_in_nonessential_pg(parametergraph,paramlis
     # If all nodes are essential return empty list
     net_spec = parametergraph.network().specification()
     essential, noness_net_spec = make_nonessential(net_spec)
-    noness_parametergraph = DSGRN.ParameterGraph(DSGRN.Network(noness_net_spec))
+    noness_parametergraph = DSGRN.ParameterGraph(_network(noness_net_spec))
     parlist_indices = []
     parlist_neighbors = set([])
     for pindex in paramlist:
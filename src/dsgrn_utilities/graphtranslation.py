@@ -1,8 +1,11 @@
 # MIT LICENSE (2018)
 # Shaun Harker and Bree Cummins
 
-import copy, json
-import networkx as nx
+import hashlib, json, re
+import numpy as np
+from collections.abc import Mapping
+from dsgrn_utilities import network_cache
+# networkx is imported inside the conversion functions below so that importing this module stays cheap.
 
 ########################
 # Directed Graph Class #
@@ -15,14 +18,24 @@ class Graph:
         """ Initialize an empty graph object """
         self.vertices_ = set()
         self.adjacency_lists_ = {}
+        self.predecessor_lists_ = {}
         self.vertex_labels_ = {}
         self.edge_labels_ = {}
+        self.label_index_ = {}
+
+    def _check_unique_label(self, v, label):
+        """ Error if a vertex other than v already has the nonempty label 'label' """
+        if label and self.label_index_.get(label, {v}) != {v}:
+            raise ValueError("Non-unique vertex labels.")
 
     def add_vertex(self, v, label=''):
-        """ Add the vertex v to the graph and associate a label if one is given """
+        """ Add the vertex v to the graph and associate a label if one is given. Error if the label is already in use. """
         if v in self.vertices_: return
+        self._check_unique_label(v, label)
+        self.label_index_.setdefault(label, set()).add(v)
         self.vertices_.add(v)
         self.adjacency_lists_[v] = set()
+        self.predecessor_lists_[v] = set()
         self.vertex_labels_[v] = label
         self.edge_labels_[v] = {}
 
@@ -31,32 +44,58 @@ class Graph:
         self.add_vertex(u)
         self.add_vertex(v)
         self.adjacency_lists_[u].add(v)
+        self.predecessor_lists_[v].add(u)
         self.edge_labels_[u][v] = label
 
     def remove_edge(self, u, v):
         """ Remove the edge u -> v from the graph """
         self.adjacency_lists_[u].discard(v)
+        self.predecessor_lists_[v].discard(u)
         self.edge_labels_[u].pop(v, None)
 
     def remove_vertex(self, u):
         """ Remove the node u and all edges from the graph """
-        self.vertices_.discard(u)
-        self.adjacency_lists_.pop(u, None)
-        self.vertex_labels_.pop(u, None)
-        self.edge_labels_.pop(u, None)
-        for v in self.vertices():
+        if u not in self.vertices_: return
+        for v in self.adjacency_lists_[u]:
+            self.predecessor_lists_[v].discard(u)
+        for v in self.predecessor_lists_[u]:
             self.adjacency_lists_[v].discard(u)
+            self.edge_labels_[v].pop(u, None)
+        self._unindex_label(u)
+        self.vertices_.discard(u)
+        self.adjacency_lists_.pop(u)
+        self.predecessor_lists_.pop(u)
+        self.vertex_labels_.pop(u)
+        self.edge_labels_.pop(u)
+
+    def _unindex_label(self, v):
+        """ Remove the vertex v from the label index """
+        label = self.vertex_labels_[v]
+        self.label_index_[label].discard(v)
+        if not self.label_index_[label]:
+            del self.label_index_[label]
+
+    def set_vertex_label(self, v, label):
+        """ Change the label on the vertex v. Error if the label is already in use by another vertex. """
+        self._check_unique_label(v, label)
+        self._unindex_label(v)
+        self.label_index_.setdefault(label, set()).add(v)
+        self.vertex_labels_[v] = label
 
     def vertex_label(self, v):
         """ Return the label on the vertex v """
         return self.vertex_labels_[v]
 
+    def vertices_with_label(self, label):
+        """ Return the set of vertices with label 'label' """
+        return self.label_index_.get(label, set())
+
     def get_vertex_from_label(self, label):
-        """ Return the vertex v with label 'label'. Error if non-unique. """
-        vertices = [v for v in self.vertices_ if self.vertex_label(v) == label]
+        """ Return the vertex v with label 'label'. Error if non-unique, which can only happen for unlabeled vertices. """
+        vertices = self.vertices_with_label(label)
         N = len(vertices)
         if N == 1:
-            return vertices[0]
+            return next(iter(vertices))
         elif N == 0:
             return None
         elif N > 1:
@@ -70,6 +109,10 @@ class Graph:
         """ Return the set of vertices in the graph """
         return self.vertices_
 
+    def has_vertex(self, v):
+        """ Return True if v is a vertex of the graph """
+        return v in self.vertices_
+
     def size(self):
         """ Return the number of vertices in the graph """
         return len(self.vertices_)
@@ -84,29 +127,358 @@ class Graph:
 
     def inedges(self,v):
         """ Return the inedges of v, i.e. { u : u -> v } """
-        return [u for u in self.vertices_ if v in self.adjacency_lists_[u]]
+        return list(self.predecessor_lists_[v])
 
     def clone(self):
         """ Return a copy of this graph """
-        return copy.deepcopy(self)
+        G = Graph()
+        G.vertices_ = set(self.vertices_)
+        G.adjacency_lists_ = {v: set(ws) for v, ws in self.adjacency_lists_.items()}
+        G.predecessor_lists_ = {v: set(us) for v, us in self.predecessor_lists_.items()}
+        G.vertex_labels_ = dict(self.vertex_labels_)
+        G.edge_labels_ = {v: dict(labels) for v, labels in self.edge_labels_.items()}
+        G.label_index_ = {label: set(vs) for label, vs in self.label_index_.items()}
+        return G
+
+    def overlay(self):
+        """ Return a copy-on-write GraphOverlay that records edits on top of this graph without changing it """
+        return GraphOverlay(self)
 
     def graphviz(self):
         """ Return a graphviz string describing the graph and its labels """
-        gv = 'digraph {\n'
+        return ''.join(self.graphviz_lines())
+
+    def graphviz_lines(self):
+        """ Generate the lines of the graphviz string describing the graph and its labels (see writeGraphviz) """
+        yield 'digraph {\n'
         indices = {v: str(k) for k, v in enumerate(self.vertices())}
+        for v, k in indices.items():
+            yield k + '[label=' + json.dumps(self.vertex_label(v), ensure_ascii=False) + '];\n'
+        for u, k in indices.items():
+            for v in self.adjacencies(u):
+                yield k + ' -> ' + indices[v] + ' [label=' + json.dumps(self.edge_label(u, v), ensure_ascii=False) + '];\n'
+        yield '}\n'
+
+    def transpose(self):
+        """ Return a new graph with edge direction reversed. """
+        G = Graph()
+        G.vertices_ = set(self.vertices_)
+        G.adjacency_lists_ = {v: set(us) for v, us in self.predecessor_lists_.items()}
+        G.predecessor_lists_ = {v: set(ws) for v, ws in self.adjacency_lists_.items()}
+        G.vertex_labels_ = dict(self.vertex_labels_)
+        G.label_index_ = {label: set(vs) for label, vs in self.label_index_.items()}
+        G.edge_labels_ = {v: {u: self.edge_labels_[u][v] for u in us} for v, us in self.predecessor_lists_.items()}
+        return G
+
+
+class GraphOverlay(Graph):
+    '''
+    A copy-on-write view of a base Graph. Edits to the overlay are recorded on top of the base, which is shared and never
+    changed, so many variants of one graph (e.g. every single-edge edit) cost memory proportional to the edited
+    vertices instead of to the graph. The first edit touching a vertex copies only that vertex's own adjacency data.
+    The base graph must not be modified while overlays of it are in use.
+    Every method of Graph is reimplemented here using only the public methods of the base, so the base can itself be
+    an overlay (see overlay()).
+    '''
+
+    def __init__(self, base):
+        """ Initialize an overlay of the Graph base with no edits """
+        self.base_ = base
+        self.vertices_added_ = set()
+        self.vertices_removed_ = set()
+        self.labels_ = {}
+        self.label_index_ = {}
+        self.out_ = {}
+        self.in_ = {}
+        self.out_labels_ = {}
+
+    def has_vertex(self, v):
+        """ Return True if v is a vertex of the graph """
+        return v in self.vertices_added_ or (v not in self.vertices_removed_ and self.base_.has_vertex(v))
+
+    def _own(self, v):
+        """ Copy the adjacency data of the base vertex v into the overlay before it is edited """
+        if v not in self.out_:
+            self.out_[v] = set(self.base_.adjacencies(v))
+            self.in_[v] = set(self.base_.inedges(v))
+            self.out_labels_[v] = {w: self.base_.edge_label(v, w) for w in self.out_[v]}
+
+    def _check_unique_label(self, v, label):
+        if label and self.get_vertex_from_label(label) not in (None, v):
+            raise ValueError("Non-unique vertex labels.")
+
+    def _unindex_label(self, v):
+        if v in self.labels_:
+            label = self.labels_[v]
+            self.label_index_[label].discard(v)
+            if not self.label_index_[label]:
+                del self.label_index_[label]
+
+    def add_vertex(self, v, label=''):
+        """ Add the vertex v to the graph and associate a label if one is given. Error if the label is already in use. """
+        if self.has_vertex(v): return
+        self._check_unique_label(v, label)
+        if v in self.vertices_removed_:
+            self.vertices_removed_.discard(v)
+        else:
+            self.vertices_added_.add(v)
+        self.out_[v], self.in_[v], self.out_labels_[v] = set(), set(), {}
+        self.labels_[v] = label
+        self.label_index_.setdefault(label, set()).add(v)
+
+    def add_edge(self, u, v, label=''):
+        """ Add the edge u -> v to the graph and associate a label if one is given """
+        self.add_vertex(u)
+        self.add_vertex(v)
+        self._own(u)
+        self._own(v)
+        self.out_[u].add(v)
+        self.in_[v].add(u)
+        self.out_labels_[u][v] = label
+
+    def remove_edge(self, u, v):
+        """ Remove the edge u -> v from the graph """
+        self._own(u)
+        self._own(v)
+        self.out_[u].discard(v)
+        self.in_[v].discard(u)
+        self.out_labels_[u].pop(v, None)
+
+    def remove_vertex(self, u):
+        """ Remove the node u and all edges from the graph """
+        if not self.has_vertex(u): return
+        self._own(u)
+        for v in self.out_[u]:
+            self._own(v)
+            self.in_[v].discard(u)
+        for v in self.in_[u]:
+            self._own(v)
+            self.out_[v].discard(u)
+            self.out_labels_[v].pop(u, None)
+        self._unindex_label(u)
+        for d in (self.out_, self.in_, self.out_labels_, self.labels_):
+            d.pop(u, None)
+        if u in self.vertices_added_:
+            self.vertices_added_.discard(u)
+        else:
+            self.vertices_removed_.add(u)
+
+    def set_vertex_label(self, v, label):
+        """ Change the label on the vertex v. Error if the label is already in use by another vertex. """
+        self._check_unique_label(v, label)
+        self._unindex_label(v)
+        self.labels_[v] = label
+        self.label_index_.setdefault(label, set()).add(v)
+
+    def vertex_label(self, v):
+        """ Return the label on the vertex v """
+        return self.labels_[v] if v in self.labels_ else self.base_.vertex_label(v)
+
+    def vertices_with_label(self, label):
+        """ Return the set of vertices with label 'label' """
+        vertices = set(self.label_index_.get(label, ()))
+        vertices.update(v for v in self.base_.vertices_with_label(label)
+                        if v not in self.labels_ and v not in self.vertices_removed_)
+        return vertices
+
+    def edge_label(self, u, v):
+        """ Return the label on the edge u -> v """
+        return self.out_labels_[u][v] if u in self.out_labels_ else self.base_.edge_label(u, v)
+
+    def vertices(self):
+        """ Return the set of vertices in the graph """
+        if not self.vertices_added_ and not self.vertices_removed_:
+            return self.base_.vertices()
+        return (self.base_.vertices() - self.vertices_removed_) | self.vertices_added_
+
+    def size(self):
+        """ Return the number of vertices in the graph """
+        return self.base_.size() - len(self.vertices_removed_) + len(self.vertices_added_)
+
+    def adjacencies(self, v):
+        """ Return the set of adjacencies (outedges) of v, i.e. { u : v -> u } """
+        return self.out_[v] if v in self.out_ else self.base_.adjacencies(v)
+
+    def inedges(self, v):
+        """ Return the inedges of v, i.e. { u : u -> v } """
+        return list(self.in_[v]) if v in self.in_ else self.base_.inedges(v)
+
+    def clone(self):
+        """ Return a copy of this overlay that shares the same base graph """
+        G = GraphOverlay(self.base_)
+        G.vertices_added_ = set(self.vertices_added_)
+        G.vertices_removed_ = set(self.vertices_removed_)
+        G.labels_ = dict(self.labels_)
+        G.label_index_ = {label: set(vs) for label, vs in self.label_index_.items()}
+        G.out_ = {v: set(ws) for v, ws in self.out_.items()}
+        G.in_ = {v: set(us) for v, us in self.in_.items()}
+        G.out_labels_ = {v: dict(labels) for v, labels in self.out_labels_.items()}
+        return G
+
+    def materialize(self):
+        """ Return an independent Graph with the edits applied """
+        G = Graph()
         for v in self.vertices():
-            gv += indices[v] + '[label="' + self.vertex_label(v) + '"];\n'
+            G.add_vertex(v, self.vertex_label(v))
         for (u, v) in self.edges():
-            gv += indices[u] + ' -> ' + indices[v] + ' [label="' + self.edge_label(u,v) + '"];\n'
-        return gv + '}\n'
+            G.add_edge(u, v, self.edge_label(u, v))
+        return G
 
     def transpose(self):
         """ Return a new graph with edge direction reversed. """
+        return self.materialize().transpose()
+
+
+class CSRGraph:
+    '''
+    A frozen, array-backed directed graph in compressed sparse row (CSR) form, for large networks that do not need to be
+    edited. Vertices are the integers 0, ..., n-1. The outedges of vertex i are targets_[offsets_[i]:offsets_[i+1]],
+    sorted by target, and edge_signs_ holds one int8 per edge: 1 for an activating edge ('a'), -1 for a repressing
+    edge ('r'), and 0 for any other edge label. vertex_ids_ remembers the vertices of the Graph the CSRGraph was built
+    from, if any, so that conversions round trip.
+    '''
+    __slots__ = ("labels_", "vertex_ids_", "offsets_", "targets_", "edge_signs_", "edge_keys_")
+
+    signs_ = {'a': 1, 'r': -1}
+    sign_labels_ = {1: 'a', -1: 'r', 0: ''}
+
+    def __init__(self, labels, offsets, targets, edge_signs, vertex_ids=None):
+        """ Initialize from vertex labels and CSR arrays. Outedges of each vertex must be sorted by target. """
+        n = len(labels)
+        arrays = [np.asarray(offsets, dtype=np.int64), np.asarray(targets, dtype=np.int32 if n < 2**31 else np.int64),
+                  np.asarray(edge_signs, dtype=np.int8)]
+        for a in arrays:
+            a.flags.writeable = False
+        if len(arrays[0]) != n + 1 or len(arrays[1]) != len(arrays[2]) or arrays[0][-1] != len(arrays[1]):
+            raise ValueError("Inconsistent CSR arrays.")
+        object.__setattr__(self, "labels_", tuple(labels))
+        object.__setattr__(self, "vertex_ids_", tuple(vertex_ids) if vertex_ids is not None else None)
+        object.__setattr__(self, "offsets_", arrays[0])
+        object.__setattr__(self, "targets_", arrays[1])
+        object.__setattr__(self, "edge_signs_", arrays[2])
+        object.__setattr__(self, "edge_keys_", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CSRGraph is immutable")
+
+    @classmethod
+    def from_edges(cls, labels, sources, targets, edge_signs, vertex_ids=None):
+        """ Build a CSRGraph from parallel arrays of edge sources, targets and signs, given in any order """
+        n = len(labels)
+        sources, targets, edge_signs = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64), np.asarray(edge_signs, dtype=np.int8)
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        return cls(labels, offsets, targets[order], edge_signs[order], vertex_ids)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """ Build a CSRGraph from a Graph object. Vertex k of the CSRGraph is the k-th vertex of the Graph in sorted order. """
+        vertex_ids = sorted(graph.vertices())
+        index = {v: k for k, v in enumerate(vertex_ids)}
+        edges = graph.edges()
+        return cls.from_edges([graph.vertex_label(v) for v in vertex_ids], [index[u] for u, v in edges],
+                              [index[v] for u, v in edges], [cls.signs_.get(graph.edge_label(u, v), 0) for u, v in edges],
+                              vertex_ids)
+
+    @classmethod
+    def from_netspec(cls, network_spec):
+        """ Build a CSRGraph from a DSGRN network specification. Vertices are numbered in specification order. """
+        nodes = parseNetworkSpec(network_spec) if network_spec else []
+        index = {name: k for k, (name, factors, essential) in enumerate(nodes)}
+        edges = {(index[i], k): cls.signs_[reg] for k, (name, factors, essential) in enumerate(nodes) for factor in factors for i, reg in factor}
+        return cls.from_edges([name for (name, factors, essential) in nodes], [u for u, v in edges], [v for u, v in edges],
+                              list(edges.values()))
+
+    @classmethod
+    def from_nxgraph(cls, nxgraph):
+        """ Build a CSRGraph from a node and edge labeled networkx.DiGraph object """
+        return cls.from_graph(nxgraph2graph(nxgraph))
+
+    def to_graph(self):
+        """ Return an equivalent Graph object """
+        ids = self.vertex_ids_ if self.vertex_ids_ is not None else range(self.size())
         G = Graph()
-        for v in self.vertices(): G.add_vertex(v, self.vertex_label(v))
-        for (u, v) in self.edges(): G.add_edge(v, u, self.edge_label(u, v))
+        for v, label in zip(ids, self.labels_):
+            G.add_vertex(v, label)
+        sources, targets = self.edges()
+        for u, v, sign in zip(sources.tolist(), targets.tolist(), self.edge_signs_.tolist()):
+            G.add_edge(ids[u], ids[v], self.sign_labels_[sign])
         return G
 
+    def to_netspec(self, essential=True):
+        """ Return a DSGRN network specification (see createEssentialNetworkSpecFromGraph) """
+        return createEssentialNetworkSpecFromGraph(self.to_graph(), essential)
+
+    def to_nxgraph(self):
+        """ Return a node and edge labeled networkx.DiGraph object """
+        return graph2nxgraph(self.to_graph())
+
+    def size(self):
+        """ Return the number of vertices in the graph """
+        return len(self.labels_)
+
+    def num_edges(self):
+        """ Return the number of edges in the graph """
+        return len(self.targets_)
+
+    def vertex_label(self, v):
+        """ Return the label on the vertex v """
+        return self.labels_[v]
+
+    def adjacencies(self, v):
+        """ Return the array of targets of the outedges of v """
+        return self.targets_[self.offsets_[v]:self.offsets_[v + 1]]
+
+    def edges(self):
+        """ Return the arrays of sources and targets of all edges """
+        return np.repeat(np.arange(self.size()), np.diff(self.offsets_)), self.targets_
+
+    def out_degree(self):
+        """ Return the array of out-degrees of all vertices """
+        return self.offsets_[1:] - self.offsets_[:-1]
+
+    def in_degree(self):
+        """ Return the array of in-degrees of all vertices """
+        return np.bincount(self.targets_, minlength=self.size())
+
+    def signed_degrees(self):
+        """ Return arrays of the numbers of activating and repressing in-edges and out-edges of all vertices """
+        sources, targets = self.edges()
+        n = self.size()
+        act, rep = self.edge_signs_ == 1, self.edge_signs_ == -1
+        return (np.bincount(targets[act], minlength=n), np.bincount(targets[rep], minlength=n),
+                np.bincount(sources[act], minlength=n), np.bincount(sources[rep], minlength=n))
+
+    def _edge_positions(self, sources, targets):
+        """ Return the positions of the edges sources[k] -> targets[k] in targets_, or -1 for edges not in the graph """
+        if self.edge_keys_ is None:
+            # edges are sorted by source and then target, so these keys are sorted
+            sources_, targets_ = self.edges()
+            object.__setattr__(self, "edge_keys_", sources_ * self.size() + targets_)
+        keys = np.asarray(sources, dtype=np.int64) * self.size() + np.asarray(targets, dtype=np.int64)
+        pos = np.searchsorted(self.edge_keys_, keys)
+        pos[pos == len(self.edge_keys_)] = 0
+        return np.where(self.edge_keys_[pos] == keys, pos, -1) if len(self.edge_keys_) else np.full(keys.shape, -1)
+
+    def has_edges(self, sources, targets):
+        """ Return a boolean array that is True where sources[k] -> targets[k] is an edge """
+        return self._edge_positions(sources, targets) >= 0
+
+    def edge_signs(self, sources, targets):
+        """ Return the int8 signs of the edges sources[k] -> targets[k], with 0 where there is no edge """
+        pos = self._edge_positions(sources, targets)
+        if not self.num_edges():
+            return np.zeros(pos.shape, dtype=np.int8)
+        return np.where(pos >= 0, self.edge_signs_[pos], 0).astype(np.int8)
+
+    def edge_label(self, u, v):
+        """ Return the label on the edge u -> v """
+        pos = self._edge_positions([u], [v])[0]
+        if pos < 0:
+            raise KeyError((u, v))
+        return self.sign_labels_[int(self.edge_signs_[pos])]
+
 
 ##################################################
 # Translation to and from network specifications
@@ -147,7 +519,7 @@ def createEssentialNetworkSpecFromGraph(graph,essential=True):
     return network_spec
 
 
-def getGraphFromNetworkSpec(network_spec):
+def getGraphFromNetworkSpec(network_spec, cached=True):
     '''
     Given a DSGRN network specification, create a Graph object from this module.
     The Graph object will have vertices that are the indices of the nodes in the network, node labels that are the names
@@ -155,34 +527,287 @@ def getGraphFromNetworkSpec(network_spec):
     The essentiality of a node is not saved.
 
     :param network_spec: DSGRN network specification
+    :param cached: True or False, whether to go through the shared network cache (see network_cache). Callers that
+    stream over many networks, each parsed once, pass False so that they neither fill the cache nor evict entries
+    that are used again.
     :return: Graph object with vertices as node
     '''
+    if not cached:
+        return _graphFromNetworkSpec(network_spec)
+    # the parsed graph is shared through network_cache, so every caller gets its own copy
+    return network_cache.cached("graph", network_spec, lambda : _graphFromNetworkSpec(network_spec)).clone()
+
+
+def _graphFromNetworkSpec(network_spec):
     if not network_spec:
         return Graph()
-    eqns = filter(bool, network_spec.split("\n"))
-    nodelist = []
-    innodes = []
-    for l in eqns:
-        words = l.replace('(', ' ').replace(')', ' ').replace('+', ' ').replace('*', ' ').split()
-        if words[-2:] == [':', 'E']:
-            words = words[:-2]
-        nodelist.append(words[0])
-        innodes.append(words[2:])  # get rid of ':' at index 1
+    nodes = parseNetworkSpec(network_spec)
+    index = {name: k for k, (name, factors, essential) in enumerate(nodes)}
     graph = Graph()
-    for k, node in enumerate(nodelist):
-        graph.add_vertex(k, label=node)
-    for outnode, ies in enumerate(innodes):
-        for ie in ies:
-            if ie[0] == '~':
-                ie = ie[1:]
-                reg = 'r'
-            else:
-                reg = 'a'
-            innode = nodelist.index(ie)
-            graph.add_edge(innode, outnode, label=reg)
+    for k, (name, factors, essential) in enumerate(nodes):
+        graph.add_vertex(k, label=name)
+    for outnode, (name, factors, essential) in enumerate(nodes):
+        for factor in factors:
+            for innode, reg in factor:
+                graph.add_edge(index[innode], outnode, label=reg)
     return graph
 
 
+def iterGraphsFromNetworkSpecs(filename):
+    '''
+    Stream Graph objects (see getGraphFromNetworkSpec) from a file of many network specifications without reading the
+    whole file into memory.
+    :param filename: either (a) a DSGRN database (.db file), in which case every specification in its Network table is
+    used, or (b) a text file of DSGRN network specifications separated by blank lines
+    :return: generator of Graph objects in file order
+    '''
+    for network_spec in iterNetworkSpecs(filename):
+        yield getGraphFromNetworkSpec(network_spec, cached=False)
+
+
+def iterNetworkSpecs(filename):
+    '''
+    Stream the network specifications in a DSGRN database (.db file) or in a text file where they are separated by
+    blank lines.
+    :param filename: path to the file
+    :return: generator of DSGRN network specifications
+    '''
+    if filename.lower().endswith('.db'):
+        import sqlite3
+        conn = sqlite3.connect(filename)
+        try:
+            for (network_spec,) in conn.execute("select Specification from Network;"):
+                yield network_spec
+        finally:
+            conn.close()
+        return
+    with open(filename) as f:
+        lines = []
+        for line in f:
+            if line.strip():
+                lines.append(line.rstrip("\n"))
+            elif lines:
+                yield "\n".join(lines)
+                lines = []
+        if lines:
+            yield "\n".join(lines)
+
+
+_spec_token = re.compile(r'[()+*~]|[^\s()+*~]+')
+
+
+def parseNetworkSpec(network_spec):
+    '''
+    Tokenize a DSGRN network specification in a single pass over its text.
+    Each line has the form "<node> : <input formula> [: E]". The input formula is a product of sums of possibly
+    negated node names, where a sum is either parenthesized, as in "(A + B)(~C)", or is the whole formula, as in
+    "A + B". Products may be written by juxtaposition or with "*". Blank lines and comment lines starting with '.' or
+    '@' are ignored.
+
+    :param network_spec: DSGRN network specification
+    :return: List of (node name, factors, essential) in specification order, where factors is a list of lists of
+    (input node name, 'a' or 'r') for each sum in the product and essential is True or False.
+    '''
+    nodes = []
+    for line in network_spec.split("\n"):
+        parts = line.split(":")
+        name = parts[0].strip()
+        if len(parts) < 2 or not name or name[0] in ".@":
+            continue
+        essential = len(parts) > 2 and parts[2].strip() == "E"
+        factors = []
+        current = None
+        inside = joined = negated = False
+        for token in _spec_token.findall(parts[1]):
+            if token == "(":
+                if current:
+                    factors.append(current)
+                current, inside = [], True
+            elif token == ")":
+                if current:
+                    factors.append(current)
+                current, inside = None, False
+            elif token == "+":
+                joined = True
+            elif token == "*":
+                if current and not inside:
+                    factors.append(current)
+                    current = None
+            elif token == "~":
+                negated = True
+            else:
+                if current is None or not (inside or joined):
+                    if current:
+                        factors.append(current)
+                    current = []
+                current.append((token, 'r' if negated else 'a'))
+                joined = negated = False
+        if current:
+            factors.append(current)
+        nodes.append((name, factors, essential))
+    return nodes
+
+
+
+##################################################
+# Streaming DOT and JSON-lines serialization
+##################################################
+
+
+def writeGraphviz(graphs, f):
+    '''
+    Write one or many graphs in graphviz DOT format to a file object, one line at a time, so that no string holding a
+    whole graph or collection is ever built. Each graph is the digraph block returned by Graph.graphviz().
+    :param graphs: Graph object or iterable of Graph objects
+    :param f: text file object open for writing
+    :return: None
+    '''
+    for graph in ([graphs] if isinstance(graphs, Graph) else graphs):
+        f.writelines(graph.graphviz_lines())
+
+
+def readGraphviz(f):
+    '''
+    Stream the graphs written by writeGraphviz() (or Graph.graphviz()) back from a file object.
+    The vertices of each graph are the integer indices in the DOT file, not the original vertices.
+    :param f: text file object open for reading
+    :return: generator of Graph objects
+    '''
+    graph = None
+    for line in f:
+        line = line.strip()
+        if line == 'digraph {':
+            graph = Graph()
+        elif line == '}':
+            yield graph
+            graph = None
+        elif line:
+            match = _dot_edge.match(line)
+            if match:
+                graph.add_edge(int(match.group(1)), int(match.group(2)), json.loads(match.group(3)))
+                continue
+            match = _dot_vertex.match(line)
+            if match:
+                graph.add_vertex(int(match.group(1)), json.loads(match.group(2)))
+
+
+_dot_vertex = re.compile(r'^(\d+)\[label=(".*")\];$')
+_dot_edge = re.compile(r'^(\d+) -> (\d+) \[label=(".*")\];$')
+
+
+def writeJSONLines(graphs, f):
+    '''
+    Write one or many graphs to a file object in JSON-lines format, one graph per line:
+    {"vertices": [[vertex, label], ...], "edges": [[source, target, label], ...]}
+    Each vertex and edge is encoded and written separately, so memory use does not grow with the graph or collection.
+    Vertices must be JSON scalars (e.g. integers or strings) to round trip.
+    :param graphs: Graph object or iterable of Graph objects
+    :param f: text file object open for writing
+    :return: None
+    '''
+    for graph in ([graphs] if isinstance(graphs, Graph) else graphs):
+        f.write('{"vertices": [')
+        for k, v in enumerate(graph.vertices()):
+            f.write((', ' if k else '') + json.dumps([v, graph.vertex_label(v)]))
+        f.write('], "edges": [')
+        first = True
+        for u in graph.vertices():
+            for v in graph.adjacencies(u):
+                f.write(('' if first else ', ') + json.dumps([u, v, graph.edge_label(u, v)]))
+                first = False
+        f.write(']}\n')
+
+
+def readJSONLines(f):
+    '''
+    Stream the graphs written by writeJSONLines() back from a file object, one line at a time.
+    :param f: text file object open for reading
+    :return: generator of Graph objects
+    '''
+    for line in f:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        graph = Graph()
+        for v, label in data["vertices"]:
+            graph.add_vertex(v, label)
+        for u, v, label in data["edges"]:
+            graph.add_edge(u, v, label)
+        yield graph
+
+
+##################################################
+# Canonical hashing of networks
+##################################################
+
+
+def canonicalNetworkHash(network, isomorphism=False, essential=True):
+    '''
+    Compute a hash that is the same for all network specifications that describe the same network, i.e. that differ only
+    in line order, whitespace, the order of factors in a product, or the order of terms in a sum. The hash is computed
+    directly from the parsed specification, without rebuilding a normalized specification string.
+    A Graph object does not record logic or essentiality, so it is hashed as the network specification that
+    createEssentialNetworkSpecFromGraph(graph, essential) would produce (all activators in one sum, each repressor its
+    own factor).
+
+    With isomorphism=True the hash ignores node names, so that networks that are the same up to renaming nodes get the
+    same hash. It uses Weisfeiler-Lehman color refinement over the logic and the activating/repressing edge labels.
+    Isomorphic networks always get the same hash; non-isomorphic networks get different hashes except in rare cases
+    where color refinement cannot tell them apart, so use it to bucket networks and confirm matches if that matters.
+
+    :param network: DSGRN network specification or Graph object
+    :param isomorphism: True or False, default=False. Whether to ignore node names.
+    :param essential: True or False, default=True. Essentiality of all nodes when network is a Graph object.
+    :return: hexadecimal hash string
+    '''
+    if isinstance(network, str):
+        nodes = parseNetworkSpec(network)
+    else:
+        nodes = []
+        for v in network.vertices():
+            inedges = [(network.vertex_label(u), network.edge_label(u, v)) for u in network.inedges(v)]
+            act = [(name, r) for (name, r) in inedges if r == 'a']
+            nodes.append((network.vertex_label(v), ([act] if act else []) + [[(name, r)] for (name, r) in inedges if r == 'r'], essential))
+    if not isomorphism:
+        return _digest(sorted((name, essential, sorted(sorted(factor) for factor in factors)) for (name, factors, essential) in nodes))
+    # Weisfeiler-Lehman refinement: a node's color combines its old color with the colors and signs of its inputs,
+    # grouped by factor, and of its outputs. Refine until the number of distinct colors stops growing.
+    outputs = {name: [] for (name, factors, essential) in nodes}
+    for (name, factors, essential) in nodes:
+        for factor in factors:
+            for (i, r) in factor:
+                outputs[i].append((r, name))
+    colors = {name: _digest((essential, sorted(sorted(r for (i, r) in factor) for factor in factors))) for (name, factors, essential) in nodes}
+    num_colors = len(set(colors.values()))
+    for _ in range(len(nodes)):
+        colors = {name: _digest((colors[name], sorted(sorted((r, colors[i]) for (i, r) in factor) for factor in factors),
+                                 sorted((r, colors[o]) for (r, o) in outputs[name]))) for (name, factors, essential) in nodes}
+        if len(set(colors.values())) == num_colors:
+            break
+        num_colors = len(set(colors.values()))
+    return _digest(sorted(colors.values()))
+
+
+def uniqueNetworkSpecs(network_specs, isomorphism=False):
+    '''
+    Remove duplicate networks from a collection of DSGRN network specifications using canonicalNetworkHash().
+    :param network_specs: iterable of DSGRN network specifications
+    :param isomorphism: True or False, default=False. Whether networks that differ only by node names are duplicates.
+    :return: List of the first specification of each distinct network, in input order
+    '''
+    seen = set()
+    unique = []
+    for network_spec in network_specs:
+        h = canonicalNetworkHash(network_spec, isomorphism)
+        if h not in seen:
+            seen.add(h)
+            unique.append(network_spec)
+    return unique
+
+
+def _digest(obj):
+    return hashlib.blake2b(repr(obj).encode(), digest_size=16).hexdigest()
+
 
 ##################################################
 # Translation to and from networkx graphs
@@ -196,8 +821,14 @@ def netspec2nxgraph(netspec):
     :param netspec: DSGRN network specification
     :return: networkx.Digraph object
     '''
-    graph = getGraphFromNetworkSpec(netspec)
-    return graph2nxgraph(graph)
+    import networkx as nx
+    nodes = parseNetworkSpec(netspec) if netspec else []
+    index = {name: k for k, (name, factors, essential) in enumerate(nodes)}
+    G = nx.DiGraph()
+    G.add_nodes_from((k, {"label": name}) for k, (name, factors, essential) in enumerate(nodes))
+    G.add_edges_from((index[i], k, {"label": reg}) for k, (name, factors, essential) in enumerate(nodes)
+                     for factor in factors for i, reg in factor)
+    return G
 
 
 def nxgraph2netspec(nxgraph):
@@ -217,11 +848,10 @@ def graph2nxgraph(graph):
     :param graph: Graph object with node and edge labels.
     :return: networkx.Digraph object
     '''
+    import networkx as nx
     G = nx.DiGraph()
-    for v in graph.vertices():
-        G.add_node(v,label=graph.vertex_label(v))
-    for (u,v) in graph.edges():
-        G.add_edge(u,v,label=graph.edge_label(u,v))
+    G.add_nodes_from((v, {"label": graph.vertex_label(v)}) for v in graph.vertices())
+    G.add_edges_from((u, v, {"label": graph.edge_label(u, v)}) for (u, v) in graph.edges())
     return G
 
 
@@ -232,12 +862,91 @@ def nxgraph2graph(nxgraph):
     :return: Graph object
     '''
     G = Graph()
-    labels = nx.get_node_attributes(nxgraph, "label")
-    for v in nxgraph.nodes:
-        G.add_vertex(v,labels[v])
-    for u,v in nxgraph.edges:
-        G.add_edge(u,v,nxgraph[u][v]["label"])
+    for v, label in nxgraph.nodes(data="label"):
+        G.add_vertex(v, label)
+    # copy the adjacency structure in bulk rather than edge by edge
+    G.adjacency_lists_ = {u: set(nbrs) for u, nbrs in nxgraph.succ.items()}
+    G.predecessor_lists_ = {v: set(nbrs) for v, nbrs in nxgraph.pred.items()}
+    G.edge_labels_ = {u: {v: data["label"] for v, data in nbrs.items()} for u, nbrs in nxgraph.succ.items()}
     return G
 
 
+def graph2nxview(graph):
+    '''
+    Get a read-only networkx DiGraph that presents a Graph (or GraphOverlay) to networkx algorithms without copying it.
+    Node and edge attribute dictionaries {"label" : ...} are made on demand from the Graph, in the same way that
+    networkx's own graph views (networkx.graphviews) wrap their underlying graphs. Changes to the Graph show up in the
+    view, and the view itself cannot be modified.
+    :param graph: Graph object with node and edge labels.
+    :return: frozen networkx.DiGraph object
+    '''
+    import networkx as nx
+    G = nx.DiGraph()
+    G._node = _NXNodeAtlas(graph)
+    G._adj = G._succ = _NXAdjacency(graph, graph.adjacencies, lambda u, v: graph.edge_label(u, v))
+    G._pred = _NXAdjacency(graph, graph.inedges, lambda v, u: graph.edge_label(u, v))
+    return nx.freeze(G)
+
+
+class _NXNodeAtlas(Mapping):
+    """ Read-only mapping vertex -> {"label" : vertex label} over a Graph """
+
+    def __init__(self, graph):
+        self.graph_ = graph
+
+    def __getitem__(self, v):
+        if not self.graph_.has_vertex(v):
+            raise KeyError(v)
+        return {"label": self.graph_.vertex_label(v)}
+
+    def __contains__(self, v):
+        return self.graph_.has_vertex(v)
+
+    def __iter__(self):
+        return iter(self.graph_.vertices())
+
+    def __len__(self):
+        return self.graph_.size()
+
+    def copy(self):
+        return {v: self[v] for v in self}
+
+
+class _NXAdjacency(_NXNodeAtlas):
+    """ Read-only mapping vertex -> neighbors -> {"label" : edge label} over a Graph """
+
+    def __init__(self, graph, neighbors, label):
+        self.graph_ = graph
+        self.neighbors_ = neighbors
+        self.label_ = label
+
+    def __getitem__(self, u):
+        if not self.graph_.has_vertex(u):
+            raise KeyError(u)
+        return _NXNeighbors(u, self.neighbors_(u), self.label_)
+
+
+class _NXNeighbors(Mapping):
+    """ Read-only mapping neighbor -> {"label" : edge label} for one vertex """
+
+    def __init__(self, u, neighbors, label):
+        self.u_ = u
+        self.neighbors_ = neighbors
+        self.label_ = label
+
+    def __getitem__(self, v):
+        if v not in self.neighbors_:
+            raise KeyError(v)
+        return {"label": self.label_(self.u_, v)}
+
+    def __contains__(self, v):
+        return v in self.neighbors_
+
+    def __iter__(self):
+        return iter(self.neighbors_)
+
+    def __len__(self):
+        return len(self.neighbors_)
 
+    def copy(self):
+        return {v: self[v] for v in self}
@@ -27,10 +27,10 @@
 # -----
 
 import re,json
-import sqlite3
 import numpy as np
-from scipy.integrate import ode
-import matplotlib.pyplot as plt
+from dsgrn_utilities import network_cache
+# scipy, matplotlib and sqlite3 are imported inside the methods that use them so that importing this module (and the
+# dsgrn_utilities package) stays cheap for processes that never simulate or plot.
 """
 import matplotlib
 font = {'family' : 'normal',
@@ -42,12 +42,17 @@ matplotlib.rc('font', **font)
 class hillmodel(object):
   '''
   This class takes a network file, a parameter, and a Hill
-  exponent and builds a Hill function model. The class has two public
+  exponent and builds a Hill function model. The class has four public
   methods:
   1) time,timeseries = hillmodel.simulateHillModel(initialconditions,initialtime,finaltime,timestep)
   2) hillmodel.plotResults(times,timeseries)
+  3) time,timeseries,varnames,events = hillmodel.simulateExtrema(initialconditions,initialtime,finaltime)
+  4) equilibria = hillmodel.findEquilibria()
   The first method generates a time series for a given set of initial conditions,
-  and the second method plots the results. 
+  the second method plots the results, the third method records only the local extrema
+  of a simulation for pattern matching at epsilon = 0, and the fourth method solves directly for the
+  steady states of the model. Time series streamed to disk by the first method can be
+  reopened with the module function loadTrajectory().
   '''
   def __init__(self,network_spec_file_or_string,parameter_spec_file_or_dict,hillexp,old_format=True):
     '''
@@ -70,8 +75,20 @@ class hillmodel(object):
     else:
       parameter = json.load(open(parameter_spec_file_or_dict))
     self.eqns=self._makeHillEqns(eqnstr,parameter,hillexp,old_format)
+    # the production bounds are only needed by findEquilibria, so they are computed on first use
+    self._maxproductionInputs=(eqnstr,parameter,old_format)
+    self._maxproduction=None
     self.d=len(eqnstr)
 
+  @property
+  def maxproduction(self):
+    """
+    List of the maximal production rates of the variables (see _makeMaxProduction), computed on first use
+    """
+    if self._maxproduction is None:
+      self._maxproduction=self._makeMaxProduction(*self._maxproductionInputs)
+    return self._maxproduction
+
   def dim(self):
     """
     Return number of variables in model
@@ -84,14 +101,20 @@ class hillmodel(object):
     """
     return self.network_spec_string
 
-  def simulateHillModel(self,initialconditions,initialtime,finaltime,timestep):
+  def simulateHillModel(self,initialconditions,initialtime,finaltime,timestep,outfile=None,chunksize=10000):
     '''
     Simulate the constructed Hill model for a given set of initial conditions 
     and time period. The given time step only specifies which output timeseries
     is returned. The time step for the backwards difference ODE solver is 
     determined by the algorithm.
 
+    If outfile is given, the trajectory is not kept in memory. Instead it is streamed
+    to the .npy file outfile in chunks of chunksize time steps while integrating, and
+    the returned times and timeseries are read-only memory maps of that file (see
+    loadTrajectory()). Use this for long-horizon simulations.
+
     '''
+    from scipy.integrate import ode
     def RHS(t,x,eqns):
       return eqns(x) #np.array(eqns(x))
     def integrate(r,y0,t0,t1,dt):
@@ -102,11 +125,105 @@ class hillmodel(object):
         times.append(r.t)
         timeseries.append(r.y)
       return times,timeseries
+    def integrate_to_file(r,y0,t0,t1,dt):
+      from dsgrn_utilities.npy_appender import NpyAppender
+      # rows of the chunk are [t, x_0, ..., x_{d-1}]; only this buffer is held in memory
+      chunk = np.empty((chunksize,len(y0)+1))
+      chunk[0,0] = t0
+      chunk[0,1:] = y0
+      n = 1
+      with NpyAppender(outfile,float,(len(y0)+1,)) as trajectory:
+        while r.successful() and r.t < t1:
+          if n == chunksize:
+            trajectory.append(chunk)
+            n = 0
+          r.integrate(r.t+dt)
+          chunk[n,0] = r.t
+          chunk[n,1:] = r.y
+          n += 1
+        trajectory.append(chunk[:n])
+      return loadTrajectory(outfile)
     r = ode(RHS).set_integrator('vode', method='bdf')
     r.set_initial_value(initialconditions,initialtime).set_f_params(self.eqns)
-    times,timeseries = integrate(r,initialconditions,initialtime,finaltime,timestep)
+    if outfile:
+      times,timeseries = integrate_to_file(r,initialconditions,initialtime,finaltime,timestep)
+    else:
+      times,timeseries = integrate(r,initialconditions,initialtime,finaltime,timestep)
     return times,timeseries,self.varnames
 
+  def simulateExtrema(self,initialconditions,initialtime,finaltime,rtol=1e-6,atol=1e-9):
+    '''
+    Simulate the constructed Hill model, but record only the local maxima and minima of
+    each variable instead of the whole trajectory. The extrema are located during the
+    integration as the roots of the components of the right-hand side (solver events),
+    so a full time series is never stored or rescanned.
+
+    Output: times, timeseries, varnames, events
+       times, timeseries -- the same form as the output of simulateHillModel, with rows for the initial
+                            state, the state at each extremum of any variable, and the final state.
+                            Every variable is monotone between consecutive rows, so this sparse series
+                            has the same extrema as the full trajectory.
+       varnames          -- list of variable names
+       events            -- time-ordered list of (time, varname, "min" or "max")
+
+    The sparse series still has to go through pattern_match_single_param.transform_ts (or main)
+    to build posets, and it only gives the same poset as the full trajectory for epsilon = 0.
+    For epsilon > 0 the poset builder needs the times at which each variable comes within
+    epsilon of its extrema, which are not recorded here; use simulateHillModel for those.
+    '''
+    from scipy.integrate import solve_ivp
+    def derivative(k,direction):
+      # maxima are where dX[k]/dt crosses zero from above, minima where it crosses from below
+      event = lambda t,x : self.eqns(x)[k]
+      event.direction = direction
+      return event
+    kinds = [(k,"max",-1) for k in range(self.d)] + [(k,"min",1) for k in range(self.d)]
+    sol = solve_ivp(lambda t,x : self.eqns(x),(initialtime,finaltime),initialconditions,method='BDF',
+                    t_eval=[finaltime],events=[derivative(k,direction) for (k,_,direction) in kinds],rtol=rtol,atol=atol)
+    extrema = sorted((t,self.varnames[k],kind,tuple(x)) for (k,kind,_),ts,xs in zip(kinds,sol.t_events,sol.y_events)
+                     for t,x in zip(ts,xs) if t > initialtime)
+    times = [initialtime] + [t for (t,_,_,_) in extrema] + list(sol.t)
+    timeseries = [np.array(initialconditions,dtype=float)] + [np.array(x) for (_,_,_,x) in extrema] + list(sol.y.T)
+    events = [(t,name,kind) for (t,name,kind,_) in extrema]
+    return times,timeseries,self.varnames,events
+
+  def findEquilibria(self,initialguesses=None,numguesses=100,tol=1e-8,stability=False,seed=None):
+    '''
+    Find the equilibria of the Hill model by Newton-type root finding (scipy's hybrid
+    Powell method) on the right-hand side, started from many initial guesses. This is
+    much cheaper than integrating to a large final time and reading off the last state,
+    and it also finds unstable equilibria.
+
+    Inputs:
+       initialguesses -- (optional) array of shape (m, dim) of starting points. If not given,
+                         numguesses points are drawn uniformly from the box that contains every
+                         equilibrium, i.e. 0 <= X[i] <= maximal production rate of X[i].
+       numguesses     -- number of random starting points when initialguesses is not given
+       tol            -- solver tolerance; also the scale below which two roots are considered the same
+       stability      -- True or False, whether to classify each equilibrium from the eigenvalues of the Jacobian
+       seed           -- (optional) seed for the random starting points
+    Output: equilibria -- array of shape (k, dim), one distinct equilibrium per row in lexicographic order
+            stability  -- only if stability=True, a list of "stable", "unstable" or "degenerate", one per equilibrium
+    '''
+    from scipy.optimize import root
+    if initialguesses is None:
+      rng = np.random.default_rng(seed)
+      initialguesses = rng.uniform(0,1,size=(numguesses,self.d))*np.array(self.maxproduction)
+    F = lambda x : np.array(self.eqns(x))
+    roots = []
+    for x0 in np.atleast_2d(initialguesses):
+      sol = root(F,x0,method='hybr',tol=tol)
+      if not sol.success or np.max(np.abs(F(sol.x))) > np.sqrt(tol):
+        continue
+      # remove roots found from more than one initial guess
+      scale = np.sqrt(tol)*max(1.0,np.max(np.abs(sol.x)))
+      if not any(np.max(np.abs(sol.x-r)) <= scale for r in roots):
+        roots.append(sol.x)
+    equilibria = np.array(sorted(roots,key=tuple)).reshape(-1,self.d)
+    if not stability:
+      return equilibria
+    return equilibria,[self._classifyEquilibrium(x,tol) for x in equilibria]
+
   def plotResults(self,times,timeseries,plotoptions={},legendoptions={},figuresize=(),labeloptions = {},axisoptions={},savename=None,skipindex=None,show=False):
     '''
     Plot a time series.
@@ -122,6 +239,7 @@ class hillmodel(object):
     axisoptions={'xlim' : [0,15], 'ylim' : [0,4]}
 
     '''
+    import matplotlib.pyplot as plt
     if figuresize:
       plt.figure(figsize=figuresize)
     colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
@@ -134,7 +252,7 @@ class hillmodel(object):
         skipindex = [skipindex]
       colors = [c for i,c in enumerate(colors) if i not in skipindex]
     plt.gca().set_prop_cycle(color = colors)
-    timeseries=np.array(timeseries)
+    timeseries=np.asarray(timeseries)
     for k in range(timeseries.shape[1]):
       plt.plot(times,timeseries[:,k],label=self.varnames[k],**plotoptions)
     plt.legend(**legendoptions)
@@ -154,6 +272,23 @@ class hillmodel(object):
 
 # The remainder of the file consists of private methods implementing various parsing voodoo.
 
+  def _classifyEquilibrium(self,x,tol):
+    """
+    Classify an equilibrium by the real parts of the eigenvalues of a central difference Jacobian.
+    """
+    J = np.empty((self.d,self.d))
+    for j in range(self.d):
+      h = 1e-6*max(1.0,abs(x[j]))
+      e = np.zeros(self.d)
+      e[j] = h
+      J[:,j] = (np.array(self.eqns(x+e))-np.array(self.eqns(x-e)))/(2*h)
+    re_eig = np.linalg.eigvals(J).real
+    if np.all(re_eig < -np.sqrt(tol)):
+      return "stable"
+    elif np.any(re_eig > np.sqrt(tol)):
+      return "unstable"
+    return "degenerate"
+
   def _parseEqns(self,network_spec_file_or_string):
     """
     Parse a network specification file to obtain data structures representing ODEs
@@ -188,6 +323,7 @@ class hillmodel(object):
     if '\n' in network_spec_file_or_string:
       self.network_spec_string = network_spec_file_or_string
     elif network_spec_file_or_string.lower().endswith('.db'):
+      import sqlite3
       conn = sqlite3.connect(network_spec_file_or_string)
       c = conn.cursor()
       c . execute ( "select Specification from Network;" )
@@ -195,10 +331,20 @@ class hillmodel(object):
     else:
       with open(network_spec_file_or_string) as f:
         self.network_spec_string = f.read()
+    # the equation structure and node index map are shared through network_cache; hand out copies
+    eqnstr, varnames, varindex = network_cache.cached("hill_equations",self.network_spec_string,lambda : self._parseEqnStrings(self.network_spec_string))
+    return list(eqnstr),list(varnames),dict(varindex)
+
+  @staticmethod
+  def _parseEqnStrings(network_spec_string):
+    """
+    Parse a network specification string into the p-n formatted equations, variable names and variable index
+    described in _parseEqns, as tuples and a dictionary that are stored in network_cache.
+    """
     eqns=[]
     varnames = []
     varindex = {}
-    for line in self.network_spec_string.splitlines():
+    for line in network_spec_string.splitlines():
       parsed = line.split(':')
       if len(parsed) < 2: continue   # Ignore blank lines
       varname = parsed[0].strip() # e.g. "X"
@@ -217,7 +363,7 @@ class hillmodel(object):
       e = e.replace(' ','').replace(')(',')*(')
       # Add parsed equation to eqnstr output list
       eqnstr.append(e)
-    return eqnstr,varnames,varindex
+    return tuple(eqnstr),tuple(varnames),varindex
       
 
   def _makeHillStrs(self,U,L,T,n,J):
@@ -259,10 +405,7 @@ class hillmodel(object):
       def replaceWithHillFunction(match):
         j = match.group(1)  # integer which indexes input variable
         regulation = match.group(2) # either "n" or "p"
-        if not old_format:
-          pair = "["+self.varnames[int(j)]+"->"+self.varnames[int(k)]+"]"
-        else:
-          pair = "["+self.varnames[int(j)]+", "+self.varnames[int(k)]+"]"
+        pair = self._makePair(j,k,old_format)
         U = str(parameter["U" + pair])
         L = str(parameter["L" + pair])
         T = str(parameter["T" + pair])
@@ -272,3 +415,39 @@ class hillmodel(object):
       expression += (',' if len(expression) > 1 else '') + "-X["+str(k)+"]+" + re.sub('([0-9]*)([np])', replaceWithHillFunction, e)
     expression += ']'
     return eval('lambda X :' + expression)
+
+  def _makePair(self,j,k,old_format):
+    """
+    Return the parameter name suffix for the edge from variable index j to variable index k,
+    "[X, Y]" in Shaun's formatting or "[X->Y]" in Marcio's formatting.
+    """
+    if not old_format:
+      return "["+self.varnames[int(j)]+"->"+self.varnames[int(k)]+"]"
+    return "["+self.varnames[int(j)]+", "+self.varnames[int(k)]+"]"
+
+  def _makeMaxProduction(self,eqnstr,parameter,old_format):
+    """
+    Compute the maximal production rate of every variable, i.e. the input formula evaluated with every
+    Hill function replaced by the larger of its two asymptotes. Since each Hill function is bounded by
+    its asymptotes and the input formulas are sums and products, every equilibrium X satisfies
+    0 <= X[k] <= maxproduction[k].
+    """
+    maxproduction = []
+    for k,e in enumerate(eqnstr):
+      def replaceWithBound(match):
+        pair = self._makePair(match.group(1),k,old_format)
+        return str(max(parameter["U" + pair],parameter["L" + pair]))
+      maxproduction.append(eval(re.sub('([0-9]*)([np])', replaceWithBound, e)) if e else 0.0)
+    return maxproduction
+
+
+def loadTrajectory(filename):
+  '''
+  Memory-map a trajectory written by hillmodel.simulateHillModel(...,outfile=filename).
+  Nothing is read into memory until it is accessed, so the result can be passed to
+  hillmodel.plotResults or to the pattern matching routines regardless of its length.
+  Output: times, timeseries -- read-only arrays of shape (N,) and (N, dim)
+  '''
+  data = np.load(filename,mmap_mode='r')
+  return data[:,0],data[:,1:]
+
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+# One process-wide cache of artifacts parsed from network specifications, shared by graphtranslation
+# (Graph objects), network_distance (node and labeled edge sets), hillmodel (Hill equation structure and node index
+# map) and get_parameter_neighbors (DSGRN Network objects). Entries are keyed by (kind, network specification), so the
+# same specification string is parsed at most once per kind while it stays in the cache.
+# Cached values are shared between callers and must not be mutated; modules hand out copies of mutable values.
+
+
+class LRUCache:
+    '''
+    A bounded, thread-safe cache that evicts the least recently used entry when it is full.
+    Example:
+        cache = LRUCache(maxsize=1000)
+        value = cache.get_or_compute(key, lambda : expensive(key))
+        cache.info()    # {'hits': ..., 'misses': ..., 'evictions': ..., 'size': ..., 'maxsize': 1000}
+    '''
+
+    def __init__(self, maxsize=4096):
+        self.maxsize_ = maxsize
+        self.entries_ = OrderedDict()
+        self.lock_ = threading.Lock()
+        self.hits_ = 0
+        self.misses_ = 0
+        self.evictions_ = 0
+
+    def get_or_compute(self, key, compute):
+        '''
+        Return the value cached under key, calling compute() to create it on a miss. compute() runs without holding
+        the lock, so two threads missing the same key at once may both compute it; the first value stored is kept.
+        '''
+        with self.lock_:
+            if key in self.entries_:
+                self.hits_ += 1
+                self.entries_.move_to_end(key)
+                return self.entries_[key]
+            self.misses_ += 1
+        value = compute()
+        with self.lock_:
+            if key in self.entries_:
+                return self.entries_[key]
+            self.entries_[key] = value
+            self._evict()
+        return value
+
+    def _evict(self):
+        while len(self.entries_) > self.maxsize_:
+            self.entries_.popitem(last=False)
+            self.evictions_ += 1
+
+    def resize(self, maxsize):
+        """ Change the maximum number of entries, evicting the least recently used entries if needed """
+        with self.lock_:
+            self.maxsize_ = maxsize
+            self._evict()
+
+    def clear(self):
+        """ Remove all entries and reset the statistics """
+        with self.lock_:
+            self.entries_.clear()
+            self.hits_ = self.misses_ = self.evictions_ = 0
+
+    def info(self):
+        """ Return a dictionary of the hit, miss and eviction counts and the current and maximum size """
+        with self.lock_:
+            return {"hits": self.hits_, "misses": self.misses_, "evictions": self.evictions_,
+                    "size": len(self.entries_), "maxsize": self.maxsize_}
+
+
+cache = LRUCache()
+
+
+def cached(kind, network_spec, compute):
+    '''
+    Return the artifact of the given kind parsed from a network specification, using the shared cache.
+    :param kind: string naming the artifact, e.g. "graph"
+    :param network_spec: DSGRN network specification
+    :param compute: function of no arguments that parses the artifact on a cache miss
+    :return: The cached artifact, which must not be mutated
+    '''
+    return cache.get_or_compute((kind, network_spec), compute)
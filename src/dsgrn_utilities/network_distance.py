@@ -1,4 +1,6 @@
+import numpy as np
 import dsgrn_utilities.graphtranslation as gt
+from dsgrn_utilities import network_cache
 
 
 def transform_edges_from_index_to_label(graph):
@@ -22,19 +24,20 @@ def symmetric_difference_graph_distance(netspec1,netspec2,normalized=False):
     are counted as having a distance of zero if and only if they have the same node name.
     This function does NOT consider isomorphisms to be distance zero unless the node names are the same.
     Note that if a node is missing, then the distance counts the missing node  AND all the inedges and outedges.
+    The node and labeled edge sets of each specification are parsed once and shared through network_cache.
 
     :param netspec1: DSGRN network specification
     :param netspec2: DSGRN network specification
     :param normalized: True or False, whether or not to normalize by the size of the graphs
     :return: The sum of the difference between the node sets and edge sets for the two networks (the symmetric difference).
     '''
-    g1 = gt.getGraphFromNetworkSpec(netspec1)
-    g2 = gt.getGraphFromNetworkSpec(netspec2)
-    nodes1 = set([g1.vertex_label(v) for v in g1.vertices()])
-    nodes2 = set([g2.vertex_label(v) for v in g2.vertices()])
+    items1 = _network_items(netspec1)
+    items2 = _network_items(netspec2)
+    nodes1 = set(item for item in items1 if len(item) == 1)
+    nodes2 = set(item for item in items2 if len(item) == 1)
     node_diff = nodes1.symmetric_difference(nodes2)
-    edges1 = transform_edges_from_index_to_label(g1)
-    edges2 = transform_edges_from_index_to_label(g2)
+    edges1 = items1 - nodes1
+    edges2 = items2 - nodes2
     edge_diff = edges1.symmetric_difference(edges2)
     diff = len(node_diff) + len(edge_diff)
     if normalized:
@@ -44,3 +47,492 @@ def symmetric_difference_graph_distance(netspec1,netspec2,normalized=False):
         return diff
 
 
+def _network_items(network, cached=True):
+    '''
+    Return the nodes and labeled edges of a network as one set of items: (name,) for a node and
+    (source name, target name, 'a' or 'r') for an edge, so that the symmetric difference distance between two
+    networks is the size of the symmetric difference of their item sets.
+    :param network: DSGRN network specification or graphtranslation.Graph() object
+    :param cached: True or False, whether to go through the shared network cache, as in
+    graphtranslation.getGraphFromNetworkSpec()
+    '''
+    if not isinstance(network, str):
+        return frozenset((network.vertex_label(v),) for v in network.vertices()) | transform_edges_from_index_to_label(network)
+    if not cached:
+        return _parse_network_items(network)
+    return network_cache.cached("network_items", network, lambda : _parse_network_items(network))
+
+
+def _parse_network_items(network_spec):
+    nodes = gt.parseNetworkSpec(network_spec) if network_spec else []
+    edges = {(i, name): reg for (name, factors, essential) in nodes for factor in factors for i, reg in factor}
+    return frozenset((name,) for (name, factors, essential) in nodes) | frozenset((u, v, reg) for (u, v), reg in edges.items())
+
+
+def encode_networks(networks, vocabulary=None):
+    '''
+    Encode networks as rows of a sparse binary matrix over a vocabulary of nodes and labeled edges. Each network is
+    parsed once; the distance computations in distance_matrix() then only use sparse matrix products.
+    :param networks: iterable of DSGRN network specifications or graphtranslation.Graph() objects
+    :param vocabulary: (optional) dictionary from item to column index, as returned by a previous call. It is extended
+    in place with new items.
+    :return: scipy.sparse.csr_matrix with one row per network, and the vocabulary. A node is the item (name,) and an
+    edge is the item (source name, target name, 'a' or 'r').
+    '''
+    from scipy.sparse import csr_matrix
+    vocabulary = {} if vocabulary is None else vocabulary
+    indptr, indices = [0], []
+    for network in networks:
+        indices.extend(sorted(vocabulary.setdefault(item, len(vocabulary)) for item in _network_items(network, cached=False)))
+        indptr.append(len(indices))
+    A = csr_matrix((np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int64), np.array(indptr)),
+                   shape=(len(indptr) - 1, len(vocabulary)))
+    return A, vocabulary
+
+
+def distance_matrix(networks, normalized=False, condensed=False, outfile=None, block_size=1024):
+    '''
+    Compute the symmetric difference graph distance (see symmetric_difference_graph_distance) between all pairs of
+    networks. With A the binary encoding of encode_networks(), the distance between networks i and j is
+    |A_i| + |A_j| - 2 (A A^T)_ij, computed block_size rows at a time so that only one block of A A^T is in memory.
+    :param networks: iterable of DSGRN network specifications or graphtranslation.Graph() objects, or a sparse
+    matrix returned by encode_networks()
+    :param normalized: True or False, whether or not to normalize by the size of the graphs. The distance between two
+    empty networks is 0.
+    :param condensed: True or False. If True, return the upper triangle in the condensed form used by
+    scipy.spatial.distance.squareform, i.e. the distance between i < j is at index N*i - i*(i+1)/2 + j - i - 1.
+    :param outfile: (optional) name of a .npy file. The matrix is written to a memory map of this file, so matrices
+    larger than memory can be computed and loaded later with numpy.load(outfile, mmap_mode='r').
+    :param block_size: number of rows computed at a time
+    :return: N x N array, or condensed array of length N*(N-1)/2, of integer distances, or floats if normalized
+    '''
+    from scipy.sparse import issparse
+    A = networks if issparse(networks) else encode_networks(networks)[0]
+    A = A.tocsr()
+    # the transpose of a CSR matrix is a CSC matrix over the same arrays, and slicing its columns is cheap
+    AT = A.T.tocsc()
+    N = A.shape[0]
+    sizes = np.diff(A.indptr).astype(np.int64)
+    shape = (N * (N - 1) // 2,) if condensed else (N, N)
+    dtype = np.float64 if normalized else np.int64
+    if outfile is None:
+        D = np.zeros(shape, dtype=dtype)
+    else:
+        D = np.lib.format.open_memmap(outfile, mode='w+', dtype=dtype, shape=shape)
+    for lo in range(0, N, block_size):
+        hi = min(lo + block_size, N)
+        # only columns from lo onwards are needed for the upper triangle
+        start = lo if condensed else 0
+        block = _distance_block(A, AT, sizes, lo, hi, start, N, normalized)
+        if not condensed:
+            D[lo:hi] = block
+            continue
+        for i in range(lo, hi):
+            offset = N * i - i * (i + 1) // 2
+            D[offset:offset + N - i - 1] = block[i - lo, i - start + 1:]
+    if outfile is not None:
+        D.flush()
+    return D
+
+
+def _distance_block(A, AT, sizes, lo, hi, start, end, normalized):
+    # distances between the networks in rows lo:hi and start:end of the encoding A, whose transpose is AT and whose
+    # row sums are sizes
+    inter = (A[lo:hi] @ AT[:, start:end]).toarray()
+    total = sizes[lo:hi, None] + sizes[None, start:end]
+    block = total - 2 * inter
+    if normalized:
+        block = np.divide(block, total, out=np.zeros(block.shape), where=total > 0)
+    return block
+
+
+class NetworkIndex:
+    '''
+    Exact nearest neighbor and radius queries for the symmetric difference graph distance over a library of networks.
+    The distance between a query q and a network x is |q| + |x| - 2 |q & x| in terms of their sets of nodes and labeled
+    edges (see encode_networks), so it is at least ||q| - |x||. Networks are kept in buckets by size, each with an
+    inverted index from items to the networks of the bucket that contain them. A query visits the buckets in order of
+    this size bound and stops as soon as the bound exceeds the radius or the distance of the k-th nearest network found
+    so far; in a visited bucket, |q & x| comes from counting the postings of the items of the query.
+    Pruning is by size only: every network in a visited bucket is scored. The index saves work when the library spans
+    many sizes, but for a library of networks of similar size a query costs about as much as a full scan.
+    Example:
+        index = NetworkIndex(netspecs)
+        index.add(another_netspec)
+        index.knn(query, 10)        # [(distance, network ID), ...]
+        index.radius(query, 4)
+    '''
+
+    def __init__(self, networks=()):
+        """ Build the index from an iterable of DSGRN network specifications or graphtranslation.Graph() objects """
+        self.size_ = 0
+        # size -> (list of network IDs, dictionary from item to positions in that list)
+        self.buckets_ = {}
+        self.arrays_ = {}
+        for network in networks:
+            self.add(network)
+
+    def __len__(self):
+        return self.size_
+
+    def add(self, network):
+        '''
+        Insert a network into the index.
+        :param network: DSGRN network specification or graphtranslation.Graph() object
+        :return: The ID of the network, which is the number of networks inserted before it
+        '''
+        n = self.size_
+        items = _network_items(network, cached=False)
+        ids, postings = self.buckets_.setdefault(len(items), ([], {}))
+        for item in items:
+            postings.setdefault(item, []).append(len(ids))
+        ids.append(n)
+        self.arrays_.pop(len(items), None)
+        self.size_ += 1
+        return n
+
+    def _bucket_distances(self, size, items):
+        # IDs of the networks with size items and their distances to a query with the given items
+        if size not in self.arrays_:
+            ids, postings = self.buckets_[size]
+            self.arrays_[size] = (np.array(ids, dtype=np.int64), {}, postings)
+        ids, arrays, postings = self.arrays_[size]
+        shared = []
+        for item in items:
+            if item in postings:
+                if item not in arrays:
+                    arrays[item] = np.array(postings[item], dtype=np.int64)
+                shared.append(arrays[item])
+        overlaps = np.bincount(np.concatenate(shared), minlength=len(ids)) if shared else np.zeros(len(ids), dtype=np.int64)
+        return ids, len(items) + size - 2 * overlaps
+
+    def _sizes_by_bound(self, q):
+        # bucket sizes in increasing order of the lower bound ||q| - size| on their distances
+        return sorted(self.buckets_, key=lambda size: abs(q - size))
+
+    def knn(self, network, k):
+        '''
+        Find the k networks closest to a query network.
+        :param network: DSGRN network specification or graphtranslation.Graph() object
+        :param k: number of neighbors
+        :return: List of at most k (distance, network ID) pairs sorted by distance and then by ID
+        '''
+        items = _network_items(network)
+        results = []
+        if k <= 0:
+            return results
+        for size in self._sizes_by_bound(len(items)):
+            bound = results[-1][0] if len(results) == k else float("inf")
+            if abs(len(items) - size) > bound:
+                break
+            ids, distances = self._bucket_distances(size, items)
+            keep = distances <= bound
+            results.extend(zip(distances[keep].tolist(), ids[keep].tolist()))
+            results = sorted(results)[:k]
+        return results
+
+    def radius(self, network, r):
+        '''
+        Find all networks within a distance r of a query network.
+        :param network: DSGRN network specification or graphtranslation.Graph() object
+        :param r: maximum distance
+        :return: List of (distance, network ID) pairs sorted by distance and then by ID
+        '''
+        items = _network_items(network)
+        results = []
+        for size in self._sizes_by_bound(len(items)):
+            if abs(len(items) - size) > r:
+                break
+            ids, distances = self._bucket_distances(size, items)
+            keep = distances <= r
+            results.extend(zip(distances[keep].tolist(), ids[keep].tolist()))
+        return sorted(results)
+
+
+class DistanceTracker:
+    '''
+    Track the symmetric difference graph distances from a network that is edited one node or edge at a time to a fixed
+    set of reference networks. The tracker holds the nodes and labeled edges of the current network and, for every
+    reference, the number of items it shares with the current network, so each edit updates all distances in
+    O(references) without parsing anything.
+    Example:
+        tracker = DistanceTracker(netspec, references)
+        tracker.add_edge("A", "B", "r")
+        tracker.remove_node("C")
+        tracker.distances()         # numpy array with one distance per reference
+    '''
+
+    def __init__(self, network, references, normalized=False):
+        '''
+        :param network: DSGRN network specification or graphtranslation.Graph() object to start from
+        :param references: iterable of DSGRN network specifications or graphtranslation.Graph() objects
+        :param normalized: True or False, whether or not distances() normalizes by the size of the graphs
+        '''
+        self.normalized_ = normalized
+        self.references_ = {}
+        sizes = []
+        for n, reference in enumerate(references):
+            items = _network_items(reference, cached=False)
+            for item in items:
+                self.references_.setdefault(item, []).append(n)
+            sizes.append(len(items))
+        self.references_ = {item: np.array(refs, dtype=np.int64) for item, refs in self.references_.items()}
+        self.reference_sizes_ = np.array(sizes, dtype=np.int64)
+        self.overlaps_ = np.zeros(len(sizes), dtype=np.int64)
+        # node -> set of its inedges and outedges (source, target), so removing a node only visits its own edges
+        self.nodes_ = {}
+        self.edges_ = {}
+        for item in _network_items(network):
+            if len(item) == 1:
+                self.add_node(item[0])
+        for item in _network_items(network):
+            if len(item) == 3:
+                self.add_edge(*item)
+
+    def _update(self, item, change):
+        refs = self.references_.get(item)
+        if refs is not None:
+            self.overlaps_[refs] += change
+
+    def size(self):
+        """ Return the number of nodes plus the number of edges of the current network """
+        return len(self.nodes_) + len(self.edges_)
+
+    def add_node(self, name):
+        """ Add the node name to the current network """
+        if name in self.nodes_: return
+        self.nodes_[name] = set()
+        self._update((name,), 1)
+
+    def remove_node(self, name):
+        """ Remove the node name and all of its inedges and outedges from the current network """
+        if name not in self.nodes_: return
+        for (u, v) in list(self.nodes_[name]):
+            self.remove_edge(u, v)
+        del self.nodes_[name]
+        self._update((name,), -1)
+
+    def add_edge(self, source, target, regulation):
+        """ Add the edge source -> target with regulation 'a' or 'r', adding the nodes if needed and replacing the
+        regulation of an existing edge """
+        self.remove_edge(source, target)
+        self.add_node(source)
+        self.add_node(target)
+        self.edges_[(source, target)] = regulation
+        self.nodes_[source].add((source, target))
+        self.nodes_[target].add((source, target))
+        self._update((source, target, regulation), 1)
+
+    def remove_edge(self, source, target):
+        """ Remove the edge source -> target from the current network """
+        if (source, target) not in self.edges_: return
+        self.nodes_[source].discard((source, target))
+        self.nodes_[target].discard((source, target))
+        self._update((source, target, self.edges_.pop((source, target))), -1)
+
+    def distances(self):
+        """ Return a numpy array of the distances from the current network to each reference """
+        diff = self.size() + self.reference_sizes_ - 2 * self.overlaps_
+        if not self.normalized_:
+            return diff
+        total = self.size() + self.reference_sizes_
+        return np.divide(diff, total, out=np.zeros(len(diff)), where=total > 0)
+
+    def graph(self):
+        """ Return the current network as a graphtranslation.Graph() object """
+        G = gt.Graph()
+        index = {}
+        for name in sorted(self.nodes_):
+            index[name] = len(index)
+            G.add_vertex(index[name], name)
+        for (u, v), regulation in self.edges_.items():
+            G.add_edge(index[u], index[v], regulation)
+        return G
+
+
+def isomorphism_graph_distance(netspec1, netspec2, normalized=False, upper_bound=None):
+    '''
+    Find the symmetric difference graph distance between two networks minimized over all relabelings of the nodes, so
+    that isomorphic networks are at distance zero whatever their node names. A relabeling matches every node of the
+    smaller network to a distinct node of the larger one; the unmatched nodes and all differences between the matched
+    edges and their regulations are counted as in symmetric_difference_graph_distance.
+    The search is a branch and bound over node matchings. Before searching, and at every step of the search, the
+    distance is bounded below by the difference in node and edge counts and by comparing the sorted activating and
+    repressing in- and out-degrees of the nodes, so pairs farther apart than upper_bound are usually rejected without
+    any search.
+
+    :param netspec1: DSGRN network specification or graphtranslation.Graph() object
+    :param netspec2: DSGRN network specification or graphtranslation.Graph() object
+    :param normalized: True or False, whether or not to normalize by the size of the graphs
+    :param upper_bound: (optional) the largest distance of interest, normalized if normalized is True
+    :return: The distance, or None if it is larger than upper_bound
+    '''
+    nodes1, signs1 = _sign_matrix(_network_items(netspec1))
+    nodes2, signs2 = _sign_matrix(_network_items(netspec2))
+    total = len(nodes1) + len(nodes2) + sum(map(len, signs1)) + sum(map(len, signs2))
+    if upper_bound is None:
+        limit = float("inf")
+    elif normalized:
+        # allow for rounding in upper_bound * total; distances are integers before normalization
+        limit = upper_bound * total + 1e-9 if total else (float("inf") if upper_bound >= 0 else -1)
+    else:
+        limit = upper_bound
+    # pad the smaller network with isolated nodes so that a relabeling is a bijection
+    n = max(len(nodes1), len(nodes2))
+    signs1 += [{} for _ in range(n - len(signs1))]
+    signs2 += [{} for _ in range(n - len(signs2))]
+    node_cost = abs(len(nodes1) - len(nodes2))
+    profiles1, profiles2 = _sign_profiles(signs1), _sign_profiles(signs2)
+    # match the nodes of network 1 with the most edges first, so that the exact part of the cost grows quickly
+    order = sorted(range(n), key=lambda u: -sum(profiles1[u]))
+    mapping = {}
+    best = [None, limit]
+
+    def lower_bound(k):
+        return -(-_profile_bound([profiles1[u] for u in order[k:]],
+                                 [profiles2[v] for v in range(n) if v not in used]) // 2)
+
+    def search(k, cost):
+        if cost + node_cost + lower_bound(k) > best[1]:
+            return
+        if k == n:
+            best[0], best[1] = cost + node_cost, cost + node_cost - 1
+            return
+        u = order[k]
+        # padding nodes of network 2 are interchangeable, so only the first unused one is tried
+        dummy = next((v for v in range(len(nodes2), n) if v not in used), n)
+        candidates = sorted((v for v in list(range(len(nodes2))) + [dummy] if v < n and v not in used),
+                            key=lambda v: (_profile_distance(profiles1[u], profiles2[v]), v))
+        for v in candidates:
+            # exact cost of the edges between u and the nodes matched so far, and of a self edge on u
+            extra = _edge_cost(signs1[u].get(u, 0), signs2[v].get(v, 0))
+            for w, x in mapping.items():
+                extra += _edge_cost(signs1[u].get(w, 0), signs2[v].get(x, 0))
+                extra += _edge_cost(signs1[w].get(u, 0), signs2[x].get(v, 0))
+            mapping[u] = v
+            used.add(v)
+            search(k + 1, cost + extra)
+            used.discard(v)
+            del mapping[u]
+
+    used = set()
+    search(0, 0)
+    if best[0] is None:
+        return None
+    return best[0] / total if normalized and total else best[0]
+
+
+def _sign_matrix(items):
+    # node names in sorted order and, for every node, a dictionary from target index to 1 ('a') or -1 ('r')
+    nodes = sorted(item[0] for item in items if len(item) == 1)
+    index = {name: k for k, name in enumerate(nodes)}
+    signs = [{} for _ in nodes]
+    for item in items:
+        if len(item) == 3:
+            signs[index[item[0]]][index[item[1]]] = 1 if item[2] == 'a' else -1
+    return nodes, signs
+
+
+def _sign_profiles(signs):
+    # (activating inedges, repressing inedges, activating outedges, repressing outedges) of every node
+    profiles = [[0, 0, 0, 0] for _ in signs]
+    for u, targets in enumerate(signs):
+        for v, s in targets.items():
+            profiles[v][0 if s > 0 else 1] += 1
+            profiles[u][2 if s > 0 else 3] += 1
+    return [tuple(p) for p in profiles]
+
+
+def _profile_distance(p, q):
+    return sum(abs(a - b) for a, b in zip(p, q))
+
+
+def _profile_bound(profiles1, profiles2):
+    # Every differing edge changes the sign profiles of at most two nodes by one, so half of the smallest total profile
+    # difference over matchings bounds the edge cost below. Matching each profile coordinate separately in sorted order
+    # gives a smaller total than any single matching.
+    return sum(sum(abs(a - b) for a, b in zip(sorted(p[c] for p in profiles1), sorted(q[c] for q in profiles2)))
+               for c in range(4))
+
+
+def _edge_cost(s, t):
+    # number of labeled edges in the symmetric difference of an edge with sign s and an edge with sign t (0 for none)
+    if s == t:
+        return 0
+    return 2 if s and t else 1
+
+
+def parallel_distance_matrix(networks, outfile, normalized=False, metric=None, tile_size=1024, processes=None):
+    '''
+    Compute the condensed distance matrix of distance_matrix(networks, normalized, condensed=True) in a process pool,
+    for collections too large for one core or for memory. The upper triangle of the N x N matrix is split into
+    tile_size x tile_size tiles that the workers write directly into a memory-mapped .npy file. Every finished tile is
+    recorded in the file outfile + ".done", and calling the function again with the same arguments after an
+    interruption computes only the missing tiles.
+
+    :param networks: list of DSGRN network specifications or graphtranslation.Graph() objects
+    :param outfile: name of the .npy file holding the condensed matrix (see distance_matrix)
+    :param normalized: True or False, whether or not to normalize by the size of the graphs
+    :param metric: (optional) function of two networks and normalized, such as isomorphism_graph_distance, computed
+    pair by pair in each tile. Default is the symmetric difference graph distance computed with sparse products.
+    :param tile_size: number of rows and columns of a tile
+    :param processes: number of worker processes, default is the number of CPUs
+    :return: Read-only memory map of the condensed matrix
+    '''
+    import os
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    N = len(networks)
+    header = "{} {} {} {}\n".format(N, tile_size, bool(normalized), getattr(metric, "__name__", None))
+    sidecar = outfile + ".done"
+    done = set()
+    if os.path.exists(outfile) and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            if f.readline() != header:
+                raise ValueError("{} was computed with different arguments.".format(outfile))
+            done = set(tuple(map(int, line.split())) for line in f if line.strip())
+    else:
+        dtype = np.float64 if normalized or metric is not None else np.int64
+        np.lib.format.open_memmap(outfile, mode='w+', dtype=dtype, shape=(N * (N - 1) // 2,)).flush()
+        with open(sidecar, 'w') as f:
+            f.write(header)
+    data = networks if metric is not None else encode_networks(networks)[0].tocsr()
+    tiles = [(lo, col) for lo in range(0, N, tile_size) for col in range(lo, N, tile_size) if (lo, col) not in done]
+    with open(sidecar, 'a') as f, ProcessPoolExecutor(processes, initializer=_init_tile_worker,
+                                                      initargs=(data, outfile, normalized, metric, tile_size)) as pool:
+        # record every tile as soon as it finishes, so a tile is never recomputed after an interruption because an
+        # earlier tile was still running
+        for future in as_completed([pool.submit(_distance_tile, tile) for tile in tiles]):
+            lo, col = future.result()
+            f.write("{} {}\n".format(lo, col))
+            f.flush()
+    return np.load(outfile, mmap_mode='r')
+
+
+_tile_worker = {}
+
+
+def _init_tile_worker(data, outfile, normalized, metric, tile_size):
+    _tile_worker.update(data=data, normalized=normalized, metric=metric, tile_size=tile_size,
+                        out=np.load(outfile, mmap_mode='r+'))
+    if metric is None:
+        _tile_worker.update(transpose=data.T.tocsc(), sizes=np.diff(data.indptr).astype(np.int64))
+
+
+def _distance_tile(tile):
+    # write the distances between rows lo:lo+tile_size and columns col:col+tile_size above the diagonal
+    lo, col = tile
+    data, normalized, metric, out = _tile_worker["data"], _tile_worker["normalized"], _tile_worker["metric"], _tile_worker["out"]
+    N = data.shape[0] if metric is None else len(data)
+    hi, end = min(lo + _tile_worker["tile_size"], N), min(col + _tile_worker["tile_size"], N)
+    if metric is None:
+        block = _distance_block(data, _tile_worker["transpose"], _tile_worker["sizes"], lo, hi, col, end, normalized)
+    else:
+        block = np.array([[metric(data[i], data[j], normalized) if j > i else 0 for j in range(col, end)]
+                          for i in range(lo, hi)], dtype=np.float64).reshape(hi - lo, end - col)
+    for i in range(lo, hi):
+        start = max(col, i + 1)
+        if start < end:
+            offset = N * i - i * (i + 1) // 2
+            out[offset + start - i - 1:offset + end - i - 1] = block[i - lo, start - col:]
+    out.flush()
+    return tile
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import dsgrn_utilities.graphtranslation as gt
+from dsgrn_utilities.npy_appender import NpyAppender
+
+# A network store is a directory of .npy files holding a collection of graphs:
+#   vertex_offsets.npy  int64, N+1     vertices of network i are vertex_offsets[i]:vertex_offsets[i+1]
+#   vertex_labels.npy   int32          index into the label table for every vertex
+#   edge_offsets.npy    int64, N+1     edges of network i are edge_offsets[i]:edge_offsets[i+1]
+#   edges.npy           int32, (E,2)   (source, target) as local vertex indices, sorted
+#   edge_signs.npy      int8           1 activating, -1 repressing, 0 other
+#   label_offsets.npy   int64, L+1     label j is the utf-8 string label_bytes[label_offsets[j]:label_offsets[j+1]]
+#   label_bytes.npy     uint8
+# Every file is opened as a read-only memory map, so opening a store is instant, networks are read by ID in O(1),
+# and processes that open the same store share its pages through the operating system's page cache.
+
+_files = ["vertex_offsets", "vertex_labels", "edge_offsets", "edges", "edge_signs", "label_offsets", "label_bytes"]
+
+
+def write_network_store(path, networks):
+    '''
+    Write a collection of networks to a binary network store. The networks are streamed, so only the label table is
+    held in memory while writing. Vertex k of a stored network is the k-th vertex of the graph in sorted order.
+    :param path: directory to create for the store
+    :param networks: iterable of Graph objects (from graphtranslation) or DSGRN network specifications
+    :return: The number of networks written
+    '''
+    os.makedirs(path, exist_ok=True)
+    arrays = {name: NpyAppender(os.path.join(path, name + ".npy"), dtype, tail) for name, dtype, tail in
+              [("vertex_offsets", np.int64, ()), ("vertex_labels", np.int32, ()), ("edge_offsets", np.int64, ()),
+               ("edges", np.int32, (2,)), ("edge_signs", np.int8, ()), ("label_offsets", np.int64, ()),
+               ("label_bytes", np.uint8, ())]}
+    label_ids = {}
+    num_vertices, num_edges, num_label_bytes, count = 0, 0, 0, 0
+    arrays["vertex_offsets"].append([0])
+    arrays["edge_offsets"].append([0])
+    arrays["label_offsets"].append([0])
+    for graph in networks:
+        if isinstance(graph, str):
+            graph = gt.getGraphFromNetworkSpec(graph, cached=False)
+        vertices = sorted(graph.vertices())
+        index = {v: k for k, v in enumerate(vertices)}
+        labels = []
+        for v in vertices:
+            label = graph.vertex_label(v)
+            if label not in label_ids:
+                encoded = np.frombuffer(label.encode(), dtype=np.uint8)
+                label_ids[label] = len(label_ids)
+                num_label_bytes += len(encoded)
+                arrays["label_bytes"].append(encoded)
+                arrays["label_offsets"].append([num_label_bytes])
+            labels.append(label_ids[label])
+        edges = sorted((index[u], index[v], gt.CSRGraph.signs_.get(graph.edge_label(u, v), 0)) for (u, v) in graph.edges())
+        arrays["vertex_labels"].append(labels)
+        arrays["edges"].append(np.array([e[:2] for e in edges]).reshape(-1, 2))
+        arrays["edge_signs"].append([e[2] for e in edges])
+        num_vertices += len(vertices)
+        num_edges += len(edges)
+        arrays["vertex_offsets"].append([num_vertices])
+        arrays["edge_offsets"].append([num_edges])
+        count += 1
+    for a in arrays.values():
+        a.close()
+    return count
+
+
+class NetworkStore:
+    '''
+    Read-only, memory-mapped access to a network store written by write_network_store().
+    Example:
+        store = NetworkStore("networks.store")
+        graph = store[12345]            # graphtranslation.Graph
+        spec = store.netspec(12345)     # DSGRN network specification
+    '''
+
+    def __init__(self, path):
+        """ Open the store in the directory path. Nothing is read until it is accessed. """
+        self.path_ = path
+        for name in _files:
+            setattr(self, name + "_", np.load(os.path.join(path, name + ".npy"), mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.vertex_offsets_) - 1
+
+    def __getitem__(self, i):
+        return self.graph(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.graph(i)
+
+    def label(self, j):
+        """ Return label j of the label table """
+        return self.label_bytes_[self.label_offsets_[j]:self.label_offsets_[j + 1]].tobytes().decode()
+
+    def labels(self, i):
+        """ Return the list of vertex labels of network i """
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return [self.label(j) for j in self.vertex_labels_[self.vertex_offsets_[i]:self.vertex_offsets_[i + 1]]]
+
+    def csr(self, i):
+        """ Return network i as a graphtranslation.CSRGraph """
+        labels = self.labels(i)
+        start, end = self.edge_offsets_[i], self.edge_offsets_[i + 1]
+        edges = self.edges_[start:end]
+        offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges[:, 0], minlength=len(labels)), out=offsets[1:])
+        return gt.CSRGraph(labels, offsets, edges[:, 1], self.edge_signs_[start:end])
+
+    def graph(self, i):
+        """ Return network i as a graphtranslation.Graph with vertices 0, ..., n-1 """
+        return self.csr(i).to_graph()
+
+    def netspec(self, i, essential=True):
+        """ Return network i as a DSGRN network specification (see graphtranslation.createEssentialNetworkSpecFromGraph) """
+        return gt.createEssentialNetworkSpecFromGraph(self.graph(i), essential)
+
@@ -0,0 +1,59 @@
+import numpy as np
+
+# .npy files that grow while they are written, shared by hillmodel.simulateHillModel(..., outfile=...) and
+# network_store.write_network_store(). numpy pads the .npy header so that the length of the first axis can change
+# without changing the header size, which is what allows rows to be appended before their number is known.
+
+
+class NpyAppender:
+    '''
+    Append rows to a .npy file whose length is not known in advance. Only the rows passed to one append() call are
+    held in memory.
+    Example:
+        with NpyAppender("trajectory.npy", float, (3,)) as a:
+            a.append(rows)              # array of shape (k, 3)
+        np.load("trajectory.npy", mmap_mode='r')
+    '''
+
+    def __init__(self, filename, dtype, tail=()):
+        '''
+        :param filename: name of the .npy file to create
+        :param dtype: numpy dtype of the array
+        :param tail: shape of one row, i.e. the shape of the array without its first axis
+        '''
+        self.f_ = open(filename, 'wb')
+        self.dtype_ = np.dtype(dtype)
+        self.tail_ = tuple(tail)
+        self.rows_ = 0
+        self.offset_ = self._write_header()
+
+    def _write_header(self):
+        # write (or rewrite in place) the header for the rows written so far and return the offset of the data
+        self.f_.seek(0)
+        np.lib.format.write_array_header_1_0(self.f_, {'descr': np.lib.format.dtype_to_descr(self.dtype_),
+                                                       'fortran_order': False, 'shape': (self.rows_,) + self.tail_})
+        offset = self.f_.tell()
+        self.f_.seek(0, 2)
+        return offset
+
+    def append(self, rows):
+        """ Append an array of rows, or anything numpy can convert to one """
+        rows = np.asarray(rows, dtype=self.dtype_).reshape((-1,) + self.tail_)
+        self.f_.write(rows.tobytes())
+        self.rows_ += len(rows)
+
+    def close(self):
+        """ Write the final number of rows into the header and close the file """
+        if self.f_.closed:
+            return
+        try:
+            if self._write_header() != self.offset_:
+                raise ValueError("The .npy header changed size; this version of numpy cannot grow .npy files in place.")
+        finally:
+            self.f_.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
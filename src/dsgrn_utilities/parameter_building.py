@@ -1,4 +1,7 @@
-import DSGRN
+import functools
+import itertools
+# DSGRN is imported on first use, so that the hex code helpers (format_hex, format_hex_array, parse_hex, ...) do not
+# pay for importing it.
 
 
 def name2index(network,node_name):
@@ -63,11 +66,14 @@ def specify_hex_eq(param,node_index,hexcode):
     :param node_index: The index of a node in a DSGRN network (i.e. the line number in the network specification
     that starts with the node name). If needed, the function name2index() transforms a node name into its index.
     :param hexcode: A DSGRN string-formatted hex code (see format_hex()) identical to the format in the logic .dat files
-    in DSGRN/src/DSGRN/Resources/logic. An example of a hexcode for a 2-in, 3-out node would be "FF8". If needed,
-    there is a function format_hex() in this module that transforms a python hex code into a DSGRN formatted hex code.
+    in DSGRN/src/DSGRN/Resources/logic, or the same hex code as an integer. An example of a hexcode for a 2-in, 3-out
+    node would be "FF8" or 0xFF8. If needed, there is a function format_hex() in this module that transforms a python
+    hex code into a DSGRN formatted hex code.
     :return: True or False -- the logic parameter is correct or not
     '''
-    return param.logic()[node_index].hex() == hexcode
+    if isinstance(hexcode,str):
+        return param.logic()[node_index].hex() == hexcode
+    return int(param.logic()[node_index].hex(),16) == hexcode
 
 
 def specify_hex_list(param,node_index,list_of_hexcodes):
@@ -77,28 +83,145 @@ def specify_hex_list(param,node_index,list_of_hexcodes):
     :param node_index: The index of a node in a DSGRN network (i.e. the line number in the network specification
     that starts with the node name). If needed, the function name2index() transforms a node name into its index.
     :param list_of_hexcodes: A list of DSGRN string-formatted hex codes (see format_hex()) identical to the format in
-    the logic .dat files in DSGRN/src/DSGRN/Resources/logic. An example of a list of hexcode for a 2-in, 3-out node
-    would be ["600", "EC0", "FF8"]. If needed, there is a function format_hex() in this
-    module that transforms a python hex code into a DSGRN formatted hex code.
+    the logic .dat files in DSGRN/src/DSGRN/Resources/logic, or of the same hex codes as integers, for example an
+    array returned by parse_hex(). An example of a list of hexcode for a 2-in, 3-out node would be ["600", "EC0", "FF8"]
+    or [0x600, 0xEC0, 0xFF8]. Hex codes are compared by value, so "ff8", "0xFF8" and 0xFF8 all match "FF8". If needed,
+    there is a function format_hex() in this module that transforms a python hex code into a DSGRN formatted hex code.
     :return: True or False -- the logic parameter is in the list or not
     '''
-    return param.logic()[node_index].hex() in list_of_hexcodes
+    hexcode = param.logic()[node_index].hex()
+    if getattr(list_of_hexcodes,"dtype",None) is not None and list_of_hexcodes.dtype.kind in "ui":
+        # numpy arrays of integer codes, e.g. from parse_hex()
+        return bool((list_of_hexcodes == parse_hex(hexcode)).any())
+    if hexcode in list_of_hexcodes:
+        return True
+    value = int(hexcode,16)
+    return any(_hex_value(h) == value for h in list_of_hexcodes)
+
+
+def _hex_value(hexcode):
+    # the integer value of a hex code given as a string or an integer, or None if it is not a hex code
+    try:
+        return int(hexcode,16) if isinstance(hexcode,str) else int(hexcode)
+    except (TypeError,ValueError):
+        return None
+
+
+def query_parameter_indices(parametergraph,hex_constraints=None,order_constraints=None):
+    '''
+    Find the indices of all parameters in a parameter graph whose nodes have hex codes and threshold orders in given
+    lists, i.e. the parameters param for which specify_hex_list(param,node_index,hex_constraints[node_index]) and
+    specify_order_list(param,node_index,order_constraints[node_index]) hold for every constrained node. The indices are
+    computed from the factorization of the parameter index used by DSGRN,
+        index = logic index + parametergraph.fixedordersize() * order index,
+    where the logic (order) index is a mixed radix number whose digit for node d is the position of its hex code
+    (permutation) among the parametergraph.logicsize(d) (parametergraph.ordersize(d)) choices for node d, with node 0
+    the least significant digit. No parameter is built, so the cost is proportional to the number of results.
+    :param parametergraph: DSGRN.ParameterGraph object
+    :param hex_constraints: (optional) dictionary from node index to a list of hex codes in any format accepted by
+    specify_hex_list(). Hex codes that are not logic parameters of the node are ignored. If needed, the function name2index() transforms a node name into
+    its index.
+    :param order_constraints: (optional) dictionary from node index to a list of permutations (see specify_order_list())
+    :return: Generator of the matching parameter indices in increasing order
+    '''
+    hex_constraints = hex_constraints or {}
+    order_constraints = order_constraints or {}
+    digits = []
+    stride = 1
+    for d in range(parametergraph.network().size()):
+        if d in hex_constraints:
+            position = {int(h,16) : k for k,h in enumerate(parametergraph.factorgraph(d))}
+            values = (_hex_value(h) for h in hex_constraints[d])
+            choices = sorted(set(position[v] for v in values if v in position))
+        else:
+            choices = range(parametergraph.logicsize(d))
+        digits.append([k*stride for k in choices])
+        stride *= parametergraph.logicsize(d)
+    for d in range(parametergraph.network().size()):
+        if d in order_constraints:
+            choices = sorted(set(order_parameter(permutation).index() for permutation in order_constraints[d]))
+        else:
+            choices = range(parametergraph.ordersize(d))
+        digits.append([k*stride for k in choices])
+        stride *= parametergraph.ordersize(d)
+    # the most significant digit varies slowest, so the indices come out sorted
+    for terms in itertools.product(*reversed(digits)):
+        yield sum(terms)
 
 
 def format_hex(hex_code,len_str):
     '''
     Format a python hex number into DSGRN hex code.
-    :param hex_code: A python hex number
+    :param hex_code: A python hex number, as a string or an integer
     :param len_str: The length of the hex strings in the logic .dat file in DSGRN/src/DSGRN/Resources/logic for the
     specific node under consideration.
     :return: A DSGRN string formatted hex code. Example: "0xfc0" will be converted to "FC0" for a 2-in, 3-out node.
     '''
-    hex_str = str(hex(int(hex_code,16)))[2:].upper()
-    if len(hex_str) < len_str:
-        # adjust to make hex parameters the right length
-        # this is particularly important for 0
-        hex_str = "0"*(len_str-len(hex_str)) + hex_str
-    return hex_str
+    if isinstance(hex_code,str):
+        hex_code = int(hex_code,16)
+    # adjust to make hex parameters the right length; this is particularly important for 0
+    return format(hex_code,"0{}X".format(len_str))
+
+
+def format_hex_array(hex_codes,len_str):
+    '''
+    Format many integer hex codes into DSGRN hex codes at once (see format_hex()).
+    :param hex_codes: sequence or array of nonnegative integers, each less than 16**len_str. Arrays of up to 64-bit codes
+    are formatted with vectorized numpy operations; wider codes are formatted one at a time.
+    :param len_str: The length of the hex strings in the logic .dat file for the node under consideration.
+    :return: numpy array of DSGRN string formatted hex codes
+    '''
+    import numpy as np
+    if len_str > 16 or (hasattr(hex_codes,"dtype") and hex_codes.dtype == object):
+        return np.array([format_hex(int(h),len_str) for h in hex_codes],dtype="U{}".format(len_str))
+    codes = np.asarray(hex_codes,dtype=np.uint64)
+    if len_str < 16 and codes.size and codes.max() >= 16**len_str:
+        raise ValueError("Hex code longer than {} digits.".format(len_str))
+    shifts = np.arange(4*(len_str-1),-1,-4,dtype=np.uint64)
+    digits = (codes[...,None] >> shifts) & np.uint64(15)
+    return _hex_tables()[0][digits].view("S{}".format(len_str))[...,0].astype("U{}".format(len_str))
+
+
+def parse_hex(hex_codes):
+    '''
+    Parse DSGRN hex codes into integers.
+    :param hex_codes: A DSGRN string formatted hex code, or a sequence or array of them
+    :return: An integer for a single hex code. For many hex codes, a numpy uint64 array if every code has at most 16
+    digits, and otherwise a numpy array of python integers.
+    '''
+    import numpy as np
+    if isinstance(hex_codes,str):
+        return int(hex_codes,16)
+    codes = np.asarray(hex_codes,dtype="S")
+    if codes.size == 0:
+        return np.zeros(codes.shape,dtype=np.uint64)
+    width = codes.dtype.itemsize
+    if width > 16:
+        return np.array([int(h,16) for h in codes.tolist()],dtype=object)
+    if (np.char.str_len(codes) == 0).any():
+        raise ValueError("Empty hex code.")
+    # right justify with zeros, then combine the values of the hex digits in each row of bytes
+    digits = _hex_tables()[1][np.char.rjust(codes,width,b"0").view(np.uint8).reshape(codes.shape + (width,))]
+    if (digits == 16).any():
+        raise ValueError("Invalid hex code {}.".format(codes[(digits == 16).any(axis=-1)][0].decode()))
+    shifts = np.arange(4*(width-1),-1,-4,dtype=np.uint64)
+    return np.bitwise_or.reduce(digits << shifts,axis=-1)
+
+
+def _hex_tables():
+    # lookup tables from digit values to hex characters and from characters to digit values, built on first use so
+    # that importing this module does not import numpy
+    import numpy as np
+    if not _hex_table_cache:
+        # 16 marks characters that are not hex digits
+        values = np.full(256,16,dtype=np.uint64)
+        for k,c in enumerate(b"0123456789ABCDEF"):
+            values[c] = values[ord(chr(c).lower())] = k
+        _hex_table_cache.extend([np.frombuffer(b"0123456789ABCDEF",dtype=np.uint8),values])
+    return _hex_table_cache
+
+
+_hex_table_cache = []
 
 
 def logic_parameter(num_in,num_out,hex_code):
@@ -108,9 +231,9 @@ def logic_parameter(num_in,num_out,hex_code):
     :param num_out: integer, number of outedges
     :param hex_code: string, DSGRN formatted hexcode such as "FF8". If needed, there is a function format_hex() in this
     module that formats a python hex code as a DSGRN formatted hex code.
-    :return: DSGRN.LogicParameter object
+    :return: DSGRN.LogicParameter object, shared with other callers asking for the same logic parameter
     '''
-    return DSGRN.LogicParameter(num_in,num_out,hex_code)
+    return _logic_parameter(num_in,num_out,hex_code)
 
 
 def order_parameter(outedge_order):
@@ -120,9 +243,23 @@ def order_parameter(outedge_order):
     Each integer is the order index of a threshold. The indices in the order parameter are NOT the node indices in
     the DSGRN network. The order integers are consecutive. We have that p < q are two order indices if and only if
     the node index of the network node p is less than the node index of q.
-    :return: DSGRN.OrderParameter object
+    :return: DSGRN.OrderParameter object, shared with other callers asking for the same order
     '''
-    return DSGRN.OrderParameter(outedge_order)
+    return _order_parameter(tuple(outedge_order))
+
+
+# DSGRN copies logic and order parameters into a Parameter, so one object per distinct value can be shared by every
+# parameter built with logic_parameter() and order_parameter().
+@functools.lru_cache(maxsize=65536)
+def _logic_parameter(num_in,num_out,hex_code):
+    import DSGRN
+    return DSGRN.LogicParameter(num_in,num_out,hex_code)
+
+
+@functools.lru_cache(maxsize=65536)
+def _order_parameter(outedge_order):
+    import DSGRN
+    return DSGRN.OrderParameter(list(outedge_order))
 
 
 def construct_parameter(network,hex_codes,orders):
@@ -139,15 +276,41 @@ def construct_parameter(network,hex_codes,orders):
     the same order as the nodes in the network specification.
     :return: DSGRN.Parameter object
     '''
-    logic_params = []
-    order_params = []
-    for i in range(network.size()):
-        num_indeges = len(network.inputs(i))
-        num_outedges = len(network.outputs(i))
-        # hack for handling no out-edges
-        if num_outedges == 0:
-            num_outedges = 1
-        logic_params.append(logic_parameter(num_indeges,num_outedges,hex_codes[i]))
-        order_params.append(order_parameter(orders[i]))
-    return DSGRN.Parameter(logic_params,order_params,network)
+    return NetworkTemplate(network).parameter(hex_codes,orders)
+
+
+class NetworkTemplate:
+    '''
+    The per-node information that construct_parameter() needs from a network, collected once so that many parameters
+    of the same network can be built without querying the network again.
+    Example:
+        template = NetworkTemplate(network)
+        params = template.parameters(zip(list_of_hex_codes,list_of_orders))
+    '''
+
+    def __init__(self,network):
+        '''
+        :param network: DSGRN.Network object
+        '''
+        self.network_ = network
+        self.num_inedges_ = tuple(len(network.inputs(i)) for i in range(network.size()))
+        # hack for handling no out-edges: DSGRN uses one fake output threshold
+        self.num_outedges_ = tuple(max(len(network.outputs(i)),1) for i in range(network.size()))
+
+    def parameter(self,hex_codes,orders):
+        '''
+        Construct a DSGRN.Parameter object. See construct_parameter() for the format of hex_codes and orders.
+        :return: DSGRN.Parameter object
+        '''
+        import DSGRN
+        logic_params = [_logic_parameter(i,o,h) for i,o,h in zip(self.num_inedges_,self.num_outedges_,hex_codes)]
+        order_params = [_order_parameter(tuple(order)) for order in orders]
+        return DSGRN.Parameter(logic_params,order_params,self.network_)
 
+    def parameters(self,rows):
+        '''
+        Construct DSGRN.Parameter objects for a batch of parameters.
+        :param rows: iterable of (hex_codes, orders) pairs, in the format of construct_parameter()
+        :return: List of DSGRN.Parameter objects
+        '''
+        return [self.parameter(hex_codes,orders) for hex_codes,orders in rows]
@@ -1,5 +1,5 @@
 import DSGRN
-from min_interval_posets import curve, posets
+# min_interval_posets is imported on first use in transform_ts() and makeposets().
 
 
 def PathMatchDomainGraph(domaingraph,patterngraph):
@@ -44,6 +44,7 @@ def check_both(paramind, paramgraph, patterngraph):
 
 
 def transform_ts(samp_time, samp_traces, names):
+    from min_interval_posets import curve
     temp_curves = [{t : None for t in samp_time} for _ in range(len(samp_traces[0]))]
     for t, ts in zip(samp_time, samp_traces):
         for k,s in enumerate(ts):
@@ -53,6 +54,7 @@ def transform_ts(samp_time, samp_traces, names):
 
 
 def makeposets(curves,epsilons):
+    from min_interval_posets import posets
     return posets.eps_posets(curves,epsilons)
 
 
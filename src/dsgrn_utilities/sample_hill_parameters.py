@@ -0,0 +1,189 @@
+import numpy as np
+
+
+def sample_hill_parameters(parameter,N,seed=None,old_format=True,batch_size=None,max_batches=10,thinning=10,burn_in=200):
+    '''
+    Draw N Hill model parameter samples (values for L, U, and T) from the region of parameter space described by a
+    DSGRN parameter. The region is a product over network nodes of the inequalities between the input polynomials of
+    a node (built from the L and U values on its inedges) and the thresholds on its outedges, so each node is sampled
+    independently. For each node, L values and U - L values are drawn uniformly from the unit box and kept when the input
+    polynomials fall into the bins prescribed by the logic parameter. If too few are kept after max_batches batches
+    (regions of nodes with many inputs can be very thin), the remaining samples are generated by hit-and-run chains
+    inside the region, started from the kept samples or, if there are none, from a point found by solving the
+    inequalities. Both methods sample uniformly from the region inside the box. Thresholds are then drawn uniformly
+    between the neighboring bins in the order prescribed by the order parameter.
+
+    :param parameter: DSGRN.Parameter object, for example from parameter_building.construct_parameter().
+    :param N: integer, number of samples
+    :param seed: (optional) seed for the random number generator
+    :param old_format: True or False, default=True. Name columns "L[X, Y]" (Shaun's formatting) or "L[X->Y]" (Marcio's
+    formatting), matching the old_format argument of hillmodel.hillmodel.
+    :param batch_size: (optional) number of candidate L and U values drawn at a time for each node. Default is 2*N.
+    :param max_batches: number of batches to draw for a node before switching to hit-and-run.
+    :param thinning: number of hit-and-run steps taken by chains started from accepted samples.
+    :param burn_in: number of hit-and-run steps taken by chains started from a solution of the inequalities.
+    :return: List of p column names and an (N x p) numpy array of samples. Row k is the parameter dictionary
+    dict(zip(names,samples[k])) expected by hillmodel.hillmodel.
+    '''
+    network = parameter.network()
+    rng = np.random.default_rng(seed)
+    batch_size = batch_size or 2*N
+    # each line of the partial orders lists the input polynomials p# and thresholds t# of a node from low to high
+    partialorders = parameter.partialorders().split("\n")
+    names = []
+    columns = []
+    for d in range(network.size()):
+        tokens = partialorders[d].split(":",1)[1].strip().strip("()").replace(" ","").split(",")
+        node = _Node(network,d,tokens)
+        LD = np.empty((N,2*node.n))
+        accepted = 0
+        for _ in range(max_batches):
+            batch = rng.uniform(0,1,size=(batch_size,2*node.n))
+            batch = batch[node.inside(batch)]
+            keep = min(len(batch),N-accepted)
+            LD[accepted:accepted+keep] = batch[:keep]
+            accepted += keep
+            if accepted == N:
+                break
+        if accepted < N:
+            # chains started from accepted samples are already uniformly distributed; a chain started from a
+            # solution of the inequalities needs a burn-in
+            if accepted:
+                LD[accepted:] = node.hit_and_run(LD[:accepted],N-accepted,thinning,rng)
+            else:
+                LD[:] = node.hit_and_run(node.feasible_point(rng)[None,:],N,burn_in,rng)
+        LU = np.empty((N,2*node.n))
+        LU[:,0::2] = LD[:,:node.n]
+        LU[:,1::2] = LD[:,:node.n] + LD[:,node.n:]
+        T = node.thresholds(LD,rng)
+        for s in node.inputs:
+            names.extend([kind + _edge_name(network,s,d,old_format) for kind in "LU"])
+        names.extend(["T" + _edge_name(network,d,t,old_format) for t in network.outputs(d)])
+        columns.extend([LU,T])
+    return names, np.hstack(columns)
+
+
+def _edge_name(network,source,target,old_format):
+    if old_format:
+        return "[" + network.name(source) + ", " + network.name(target) + "]"
+    return "[" + network.name(source) + "->" + network.name(target) + "]"
+
+
+class _Node:
+    '''
+    The region of L and U values and thresholds of one network node. Points of the region are rows of
+    [L_0, ..., L_{n-1}, U_0 - L_0, ..., U_{n-1} - L_{n-1}] for the n inputs in network.inputs(d) order.
+    '''
+
+    def __init__(self,network,d,tokens):
+        self.inputs = network.inputs(d)
+        self.n = len(self.inputs)
+        self.num_outputs = len(network.outputs(d))
+        self.factors = [[self.inputs.index(s) for s in factor] for factor in network.logic(d)]
+        # input combination c uses U for inputs[k] if bit k of c is set and L otherwise
+        combinations = np.arange(2**self.n)
+        self.high = [((combinations >> k) & 1) == 1 for k in range(self.n)]
+        # split the tokens into the bins of polynomials between consecutive thresholds
+        self.bins = [[]]
+        self.threshold_ids = []
+        for tok in tokens:
+            if tok[0] == "p":
+                self.bins[-1].append(int(tok[1:]))
+            else:
+                self.threshold_ids.append(int(tok[1:]))
+                self.bins.append([])
+        # the r-th lowest threshold lies between everything below it and everything above it
+        self.below = [sum(self.bins[:r+1],[]) for r in range(len(self.threshold_ids))]
+        self.above = [sum(self.bins[r+1:],[]) for r in range(len(self.threshold_ids))]
+
+    def polynomials(self,LD):
+        L = LD[:,:self.n]
+        U = L + LD[:,self.n:]
+        polynomials = np.ones((len(LD),len(self.high[0]) if self.high else 1))
+        for factor in self.factors:
+            total = np.zeros(polynomials.shape)
+            for k in factor:
+                total += np.where(self.high[k],U[:,[k]],L[:,[k]])
+            polynomials *= total
+        return polynomials
+
+    def gaps(self,polynomials):
+        # lower and upper end of the gap available to each threshold, from low to high
+        M = len(polynomials)
+        lo = [polynomials[:,b].max(axis=1) if b else np.zeros(M) for b in self.below]
+        hi = [polynomials[:,a].min(axis=1) if a else np.full(M,np.inf) for a in self.above]
+        return (np.column_stack(lo),np.column_stack(hi)) if lo else (np.zeros((M,0)),np.zeros((M,0)))
+
+    def inside(self,LD):
+        """ Return a boolean array telling which rows of LD lie in the region of the node """
+        lo,hi = self.gaps(self.polynomials(LD))
+        return np.all(lo < hi,axis=1) & np.all((LD > 0) & (LD < 1),axis=1)
+
+    def feasible_point(self,rng,attempts=100):
+        '''
+        Find one point of the region by solving the inequalities between the logarithms of the input polynomials of
+        consecutive bins, from random starting points.
+        '''
+        from scipy.optimize import minimize
+        bins = [b for b in self.bins if b]
+        def margins(z):
+            logp = np.log(self.polynomials(np.exp(z)[None,:]))[0]
+            return np.concatenate([[logp[c1] - logp[c0] - 1e-3 for c0 in b0 for c1 in b1] for b0,b1 in zip(bins,bins[1:])] + [[1.0]])
+        for _ in range(attempts):
+            z0 = rng.uniform(-5,-0.1,size=2*self.n)
+            z = minimize(lambda z : 0.0,z0,method="SLSQP",bounds=[(-30,-1e-3)]*(2*self.n),
+                         constraints=[{"type" : "ineq","fun" : margins}]).x
+            if self.inside(np.exp(z)[None,:])[0]:
+                return np.exp(z)
+        raise ValueError("No point found in the parameter region.")
+
+    def hit_and_run(self,starts,N,steps,rng):
+        '''
+        Run N hit-and-run chains for the given number of steps, cycling through the start points, and return their
+        end points. Each step picks a random direction and a uniform point on the part of that line inside the unit box,
+        shrinking the segment towards the current point until the new point lies inside the region. The uniform
+        distribution on the region is invariant under these steps.
+        '''
+        x = starts[np.arange(N) % len(starts)].copy()
+        for _ in range(steps):
+            u = rng.normal(size=x.shape)
+            u /= np.linalg.norm(u,axis=1,keepdims=True)
+            # the segment {x + t u : a < t < b} inside the open unit box
+            with np.errstate(divide="ignore"):
+                t0, t1 = -x/u, (1 - x)/u
+            a = np.max(np.minimum(t0,t1),axis=1)
+            b = np.min(np.maximum(t0,t1),axis=1)
+            todo = np.arange(N)
+            while len(todo):
+                t = rng.uniform(a[todo],b[todo])
+                y = x[todo] + t[:,None]*u[todo]
+                ok = self.inside(y)
+                x[todo[ok]] = y[ok]
+                a[todo] = np.where(~ok & (t < 0),t,a[todo])
+                b[todo] = np.where(~ok & (t >= 0),t,b[todo])
+                todo = todo[~ok]
+        return x
+
+    def thresholds(self,LD,rng):
+        '''
+        Draw thresholds uniformly in the gaps between the bins of input polynomials for every row of LD.
+        :return: (M x num_outputs) array of thresholds in network.outputs(d) order
+        '''
+        lo,hi = self.gaps(self.polynomials(LD))
+        hi = np.where(np.isinf(hi),2*lo + (lo == 0),hi)
+        # thresholds sharing a gap (no polynomial between them) are sorted uniform samples in that gap
+        ranked = np.empty_like(lo)
+        r = 0
+        while r < len(self.threshold_ids):
+            g = 1
+            while r + g < len(self.threshold_ids) and not self.bins[r+g]:
+                g += 1
+            u = np.sort(rng.uniform(0,1,size=(len(lo),g)),axis=1)
+            ranked[:,r:r+g] = lo[:,r:r+g] + u*(hi[:,r:r+g] - lo[:,r:r+g])
+            r += g
+        # a node without outedges has one fake threshold that constrains L and U but is not a Hill parameter
+        T = np.empty((len(lo),self.num_outputs))
+        for r,j in enumerate(self.threshold_ids):
+            if j < T.shape[1]:
+                T[:,j] = ranked[:,r]
+        return T
@@ -1,8 +1,7 @@
-import itertools
+import itertools, os
 import dsgrn_utilities.parameter_building as buildparam
 import dsgrn_utilities.network2logicfile as netlogic
 from math import factorial
-from functools import reduce
 
 
 def get_possible_hex_numbers(num_inedges,num_outedges,len_hex_str):
@@ -26,16 +25,28 @@ def get_possible_hex_numbers(num_inedges,num_outedges,len_hex_str):
     network2logicfile has functions that can find and read the appropriate logic file for a node.
     :return: List of DSGRN formatted hex numbers
     '''
+    return buildparam.format_hex_array(get_possible_hex_integers(num_inedges,num_outedges),len_hex_str).tolist()
+
+
+def get_possible_hex_integers(num_inedges,num_outedges):
+    '''
+    The hex codes of get_possible_hex_numbers() as integers, in the same order.
+    :param num_inedges: integer, number of inedges
+    :param num_outedges: integer, number of outedges
+    :return: numpy uint64 array of hex codes, or numpy array of python integers if the codes are wider than 64 bits
+    '''
+    import numpy as np
     num_words = 2**num_inedges
-    below_thresholds = "0"*num_outedges
-    above_thresholds = "1"*num_outedges
-    tally_lists = itertools.product([below_thresholds,above_thresholds],repeat=num_words)
-    tally_strings = ["".join(t) for t in tally_lists]
-    hex_numbers = [hex(int(t,2)) for t in tally_strings]
-    boolean_hex =[]
-    for h in hex_numbers:
-        boolean_hex.append(buildparam.format_hex(h, len_hex_str))
-    return boolean_hex
+    above_thresholds = 2**num_outedges - 1
+    # bit k of the index of a Boolean function says whether the k-th output word from the right is all 1's
+    if num_words*num_outedges <= 64:
+        functions = np.arange(2**num_words,dtype=np.uint64)
+        codes = np.zeros(len(functions),dtype=np.uint64)
+        for k in range(num_words):
+            codes |= ((functions >> np.uint64(k)) & np.uint64(1)) * np.uint64(above_thresholds << (num_outedges*k))
+        return codes
+    return np.array([sum(above_thresholds << (num_outedges*k) for k in range(num_words) if f >> k & 1)
+                     for f in range(2**num_words)],dtype=object)
 
 
 def subset_boolean_parameters_single_order(network):
@@ -75,11 +86,8 @@ def subset_boolean_parameters(network):
         # specify only a single threshold order. Since all thresholds are bunched together in the same location in
         # the DSGRN parameter inequalities, a single order captures all dynamics.
         list_of_orders.append(list(range(oe)))
-    boolean_params = []
-    for hex_codes in itertools.product(*list_of_hexcodes):
-        param = buildparam.construct_parameter(network,hex_codes,list_of_orders)
-        boolean_params.append(param)
-    return boolean_params
+    template = buildparam.NetworkTemplate(network)
+    return template.parameters((hex_codes,list_of_orders) for hex_codes in itertools.product(*list_of_hexcodes))
 
 
 def subset_boolean_parameters_all_orders(network):
@@ -115,12 +123,9 @@ def subset_boolean_parameters_all_orders(network):
         # specify only a single threshold order. Since all thresholds are bunched together in the same location in
         # the DSGRN parameter inequalities, a single order captures all dynamics.
         list_of_orders.append(list(itertools.permutations(range(oe))))
-    boolean_params = []
-    for hex_codes in itertools.product(*list_of_hexcodes):
-        for orders in itertools.product(*list_of_orders):
-            param = buildparam.construct_parameter(network,hex_codes,orders)
-            boolean_params.append(param)
-    return boolean_params
+    template = buildparam.NetworkTemplate(network)
+    return template.parameters((hex_codes,orders) for hex_codes in itertools.product(*list_of_hexcodes)
+                               for orders in itertools.product(*list_of_orders))
 
 
 def count_boolean_parameters(network):
@@ -134,25 +139,123 @@ def count_boolean_parameters(network):
     :param network: DSGRN.Network object
     :return: Two integers, the count for a single order and the count for all orders.
     '''
-    # pull out information about individual nodes from the network
-    num_inedges, num_outedges, groups, essential = netlogic.get_info_from_network(network)
-    num_hexcodes = []
-    num_orders = []
-    # For each node in the network, get the number of hexcodes and the number of orders
-    for ie,oe,g,e in zip(num_inedges,num_outedges,groups,essential):
+    counts = count_boolean_parameters_many([network])
+    return counts[0][0], counts[1][0]
+
+
+def count_boolean_parameters_many(networks,table_file=None):
+    '''
+    Count the DSGRN parameters that are strict monotone Boolean functions for many networks at once (see
+    count_boolean_parameters()). Each node is looked up in the table of boolean_count_table() by its logic file name,
+    so no logic file is read once the table holds every node signature that occurs.
+    :param networks: iterable of DSGRN.Network objects
+    :param table_file: (optional) file caching the table, see boolean_count_table()
+    :return: Two numpy arrays of python integers, the counts for a single order and for all orders of each network.
+    '''
+    import numpy as np
+    names = []
+    num_outedges = []
+    sizes = []
+    for network in networks:
+        num_in, num_out, groups, essential = netlogic.get_info_from_network(network)
         # handle hack for no out-edges (fake output threshold)
-        if oe == 0:
-            oe = 1
-        # read the appropriate logic .dat file and find out the length of the hex codes in the file for DSGRN formatting
-        hexcodes_in_file = netlogic.get_logic_file(ie,oe,g,e,netlogic.get_path_to_logic_files())
-        len_hex_str = len(hexcodes_in_file[0])
-        # construct all possible Boolean functions
-        boolean_functions = get_possible_hex_numbers(ie,oe,len_hex_str)
-        # find all monotone Boolean functions by intersecting all Boolean functions with DSGRN logic parameters
-        num_hexcodes.append(len(set(hexcodes_in_file).intersection(boolean_functions)))
-        # the number of orders is the factorial of the number of outedges
-        num_orders.append(factorial(oe))
-    single_order_count = reduce((lambda x, y: x * y), num_hexcodes)
-    all_orders_count = single_order_count * reduce((lambda x, y: x * y), num_orders)
+        num_out = [oe if oe > 0 else 1 for oe in num_out]
+        names.extend(netlogic.build_logic_file_name(ie,oe,g,e) for ie,oe,g,e in zip(num_in,num_out,groups,essential))
+        num_outedges.extend(num_out)
+        sizes.append(len(num_out))
+    table = boolean_count_table(set(names),table_file)
+    # python integers, since the products overflow 64 bits for large networks
+    num_hexcodes = np.array([table[name] for name in names] + [1],dtype=object)
+    # the number of orders is the factorial of the number of outedges
+    num_orders = np.array([factorial(oe) for oe in num_outedges] + [1],dtype=object)
+    starts = np.cumsum([0] + sizes[:-1])
+    single_order_count = np.multiply.reduceat(num_hexcodes,starts) if sizes else np.zeros(0,dtype=object)
+    all_orders_count = single_order_count * np.multiply.reduceat(num_orders,starts) if sizes else np.zeros(0,dtype=object)
+    # an empty network has one parameter
+    empty = np.array(sizes) == 0
+    single_order_count[empty] = 1
+    all_orders_count[empty] = 1
     return single_order_count, all_orders_count
 
+
+def boolean_count_table(logic_files=None,table_file=None):
+    '''
+    The number of strict monotone Boolean functions in DSGRN logic files, i.e. the number of hex codes in the file
+    whose output words are all 0's or all 1's (see get_possible_hex_numbers()). The table is stored in a JSON file
+    and only logic files that are not in it yet are read, so each logic file is read at most once. Every count is stored
+    with the size and modification time of its logic file, and counts of logic files that have changed since, e.g.
+    by upgrading DSGRN in place, are discarded and computed again.
+    :param logic_files: (optional) collection of logic file names (see network2logicfile.build_logic_file_name()) that
+    the table must contain. Default is every logic file shipped with DSGRN.
+    :param table_file: (optional) JSON file caching the table. Default is dsgrn_utilities/boolean_counts.json in the
+    directory given by the XDG_CACHE_HOME environment variable, or ~/.cache.
+    :return: Dictionary from logic file name to count
+    '''
+    import json
+    logic_path = netlogic.get_path_to_logic_files()
+    if table_file is None:
+        table_file = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                  "dsgrn_utilities","boolean_counts.json")
+    if logic_files is None:
+        logic_files = [f for f in os.listdir(logic_path) if f.endswith(".dat")]
+    key = (logic_path,table_file)
+    if key not in _boolean_count_tables:
+        table,stamps = {},{}
+        if os.path.exists(table_file):
+            with open(table_file) as f:
+                stored = json.load(f)
+            # the counts are only valid for the logic files they were computed from
+            if stored["logic_path"] == logic_path:
+                stamps = {name : stamp for name,stamp in stored.get("stamps",{}).items()
+                          if stamp == _logic_file_stamp(name,logic_path)}
+                table = {name : count for name,count in stored["counts"].items() if name in stamps}
+        _boolean_count_tables[key] = (table,stamps)
+    table,stamps = _boolean_count_tables[key]
+    missing = [f for f in logic_files if f not in table]
+    if missing:
+        for logic_file in missing:
+            table[logic_file] = _count_boolean_hex_codes(logic_file,logic_path)
+            stamps[logic_file] = _logic_file_stamp(logic_file,logic_path)
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(table_file))
+        os.makedirs(directory,exist_ok=True)
+        # a temporary file of its own in the same directory, so concurrent writers never share it and the
+        # rename is atomic
+        fd,tmp_file = tempfile.mkstemp(dir=directory,suffix=".tmp")
+        try:
+            with os.fdopen(fd,"w") as f:
+                json.dump({"logic_path" : logic_path, "counts" : table, "stamps" : stamps},f)
+            os.replace(tmp_file,table_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+    return table
+
+
+_boolean_count_tables = {}
+
+
+def _logic_file_stamp(logic_file,logic_path):
+    # [size, modification time in ns] of a logic file, or None if it does not exist
+    try:
+        stat = os.stat(os.path.join(logic_path,logic_file))
+    except OSError:
+        return None
+    return [stat.st_size,stat.st_mtime_ns]
+
+
+def _count_boolean_hex_codes(logic_file,logic_path):
+    import numpy as np
+    # logic file names start with the numbers of inedges and outedges, e.g. 2_3_1_1_E.dat
+    num_inedges,num_outedges = map(int,logic_file[:-len(".dat")].split("_")[:2])
+    with open(os.path.join(logic_path,logic_file)) as f:
+        codes = buildparam.parse_hex([h.strip() for h in f if h.strip()])
+    above_thresholds = 2**num_outedges - 1
+    boolean = np.ones(len(codes),dtype=bool)
+    if codes.dtype == object:
+        above_thresholds = int(above_thresholds)
+    for k in range(2**num_inedges):
+        word = (codes >> (num_outedges*k)) & above_thresholds if codes.dtype == object else \
+               (codes >> np.uint64(num_outedges*k)) & np.uint64(above_thresholds)
+        boolean &= (word == 0) | (word == above_thresholds)
+    return int(boolean.sum())
@@ -0,0 +1,14 @@
+import os
+import pytest
+
+
+@pytest.fixture(autouse=True,scope="session")
+def cache_home(tmp_path_factory):
+    # keep caches written by the package (e.g. select_boolean_params.boolean_count_table) out of $HOME
+    previous = os.environ.get("XDG_CACHE_HOME")
+    os.environ["XDG_CACHE_HOME"] = str(tmp_path_factory.mktemp("cache"))
+    yield os.environ["XDG_CACHE_HOME"]
+    if previous is None:
+        del os.environ["XDG_CACHE_HOME"]
+    else:
+        os.environ["XDG_CACHE_HOME"] = previous
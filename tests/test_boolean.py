@@ -113,3 +113,37 @@ def test5():
     single_order, all_orders = selectbool.count_boolean_parameters(network)
     assert(single_order == 1458)
 
+
+
+def test_count_table():
+    import os, tempfile
+    import dsgrn_utilities.network2logicfile as netlogic
+    networks = [DSGRN.Network(f) for f in ["toggle_switch_33node_reduction_4node.txt","toggle_switch_33node_reduction_4node_E.txt"]]
+    networks.append(DSGRN.Network("x : (x)(y)(~z) : E\ny : (x)(~z) : E\nz : (y) : E"))
+    with tempfile.TemporaryDirectory() as d:
+        table_file = os.path.join(d,"counts.json")
+        single_order, all_orders = selectbool.count_boolean_parameters_many(networks,table_file)
+        assert(list(single_order) == [48000,1458,18])
+        assert(list(all_orders) == [selectbool.count_boolean_parameters(n)[1] for n in networks])
+        assert(all_orders[2] == 18*8)
+        # the counts agree with intersecting the logic files with all Boolean functions
+        table = selectbool.boolean_count_table(["1_1_1.dat","2_2_1_1_E.dat","3_2_1_2.dat","2_3_2_E.dat"],table_file)
+        for name,count in table.items():
+            ie,oe = map(int,name[:-4].split("_")[:2])
+            with open(os.path.join(netlogic.get_path_to_logic_files(),name)) as f:
+                hexcodes = [h.strip() for h in f]
+            assert(count == len(set(hexcodes).intersection(selectbool.get_possible_hex_numbers(ie,oe,len(hexcodes[0])))))
+        # the table persists on disk
+        selectbool._boolean_count_tables.clear()
+        assert(selectbool.boolean_count_table([],table_file) == table)
+        # counts of logic files that changed since they were stored are computed again
+        import json
+        with open(table_file) as f:
+            stored = json.load(f)
+        stored["counts"]["1_1_1.dat"] = -1
+        stored["stamps"]["1_1_1.dat"][1] -= 1
+        with open(table_file,"w") as f:
+            json.dump(stored,f)
+        selectbool._boolean_count_tables.clear()
+        assert("1_1_1.dat" not in selectbool.boolean_count_table([],table_file))
+        assert(selectbool.boolean_count_table(["1_1_1.dat"],table_file) == table)
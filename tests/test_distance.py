@@ -1,5 +1,20 @@
+import random
 from dsgrn_utilities.network_distance import symmetric_difference_graph_distance
 
+netspecs = ["A : (F) : E\nB : (C) : E\nC : (A + E)(~D) : E\nD : (~A)(~E) : E\nE : (F)(~B) : E\nF : (~B) : E",
+            "A : (F) : E\nB : (C) : E\nC : (A)(~D) : E\nD : (~A)(~E) : E\nE : (E + F)(~B) : E\nF : (~B) : E",
+            "A : (F) : E\nB : (C) : E\nC : (A)\nE : (E + F)(~B) : E\nF : (~B)",
+            "A : (H) : E\nB : (C) : E\nC : (A)\nE : (E + H)(~B) : E\nH : (~B)"]
+
+
+def random_netspec(names):
+    # a random network on the nodes names, where each node is an input of each other node with probability 0.4
+    lines = []
+    for x in names:
+        factors = ["(" + ("~" if random.random() < 0.5 else "") + y + ")" for y in names if random.random() < 0.4]
+        lines.append(x + " : " + "".join(factors) + " : E")
+    return "\n".join(lines)
+
 
 def test1():
     netspec1 = "A : (F) : E\nB : (C) : E\nC : (A + E)(~D) : E\nD : (~A)(~E) : E\nE : (F)(~B) : E\nF : (~B) : E"
@@ -20,3 +35,137 @@ def test3():
     netspec2 = "A : (H) : E\nB : (C) : E\nC : (A)\nE : (E + H)(~B) : E\nH : (~B)"
     assert(symmetric_difference_graph_distance(netspec1,netspec2) == 14)
     assert(symmetric_difference_graph_distance(netspec1,netspec2,normalized=True) ==  14 / 28)
+
+
+def test_distance_matrix():
+    import os, tempfile
+    import numpy as np
+    from dsgrn_utilities.network_distance import distance_matrix, encode_networks
+    networks = netspecs + [""]
+    N = len(networks)
+    expected = np.array([[symmetric_difference_graph_distance(a, b) for b in networks] for a in networks])
+    assert(np.array_equal(distance_matrix(networks), expected))
+    normalized = distance_matrix(networks, normalized=True, block_size=2)
+    assert(normalized[0, 1] == 2 / 32 and normalized[0, 2] == 6 / 28 and normalized[4, 4] == 0)
+    condensed = distance_matrix(networks, condensed=True, block_size=3)
+    assert(np.array_equal(condensed, [expected[i, j] for i in range(N) for j in range(i + 1, N)]))
+    A, vocabulary = encode_networks(networks)
+    assert(A.shape == (N, len(vocabulary)) and ("H", "E", "a") in vocabulary)
+    with tempfile.TemporaryDirectory() as d:
+        outfile = os.path.join(d, "distances.npy")
+        distance_matrix(A, condensed=True, outfile=outfile)
+        assert(np.array_equal(np.load(outfile, mmap_mode='r'), condensed))
+
+
+def test_network_index():
+    from dsgrn_utilities.network_distance import NetworkIndex
+    random.seed(3)
+    library = [random_netspec(random.sample("ABCDE", random.randint(1, 5))) for _ in range(60)]
+    index = NetworkIndex(library[:30])
+    # queries between insertions see the networks inserted so far
+    assert(index.knn(library[40], 30) == sorted((symmetric_difference_graph_distance(library[40], x), n) for n, x in enumerate(library[:30])))
+    for netspec in library[30:]:
+        index.add(netspec)
+    assert(len(index) == 60)
+    for query in [random_netspec(random.sample("ABCDE", random.randint(1, 5))) for _ in range(10)] + ["X : (X) : E"]:
+        expected = sorted((symmetric_difference_graph_distance(query, x), n) for n, x in enumerate(library))
+        assert(index.knn(query, 5) == expected[:5])
+        assert(index.knn(query, 100) == expected)
+        assert(index.radius(query, 4) == [e for e in expected if e[0] <= 4])
+    assert(index.knn("A : (A) : E", 0) == [])
+
+
+def test_distance_tracker():
+    from dsgrn_utilities.network_distance import DistanceTracker
+    import dsgrn_utilities.graphtranslation as gt
+    references = [netspecs[0], netspecs[2], netspecs[3]]
+    start = netspecs[1]
+    tracker = DistanceTracker(start, references)
+    normalized = DistanceTracker(start, references, normalized=True)
+
+    def check():
+        netspec = gt.createEssentialNetworkSpecFromGraph(tracker.graph())
+        assert(list(tracker.distances()) == [symmetric_difference_graph_distance(netspec, r) for r in references])
+        assert(list(normalized.distances()) == [symmetric_difference_graph_distance(netspec, r, True) for r in references])
+
+    check()
+    for t in [tracker, normalized]:
+        t.add_edge("E", "C", "a")
+        t.remove_edge("E", "E")
+    check()
+    for t in [tracker, normalized]:
+        t.remove_node("D")
+        t.add_edge("H", "A", "r")
+        t.add_edge("H", "A", "a")
+    check()
+    for t in [tracker, normalized]:
+        t.add_node("G")
+        t.remove_node("G")
+        t.remove_edge("X", "Y")
+    check()
+    # removing a node removes its self-loop and its edges in both directions
+    for t in [tracker, normalized]:
+        t.add_edge("A", "A", "a")
+        t.remove_node("A")
+        assert(all("A" not in e for e in t.edges_) and all("A" not in e for n in t.nodes_ for e in t.nodes_[n]))
+    check()
+
+
+def test_isomorphism_distance():
+    import itertools
+    from dsgrn_utilities.network_distance import isomorphism_graph_distance
+    netspec = "A : (A + B)(~C) : E\nB : (~A) : E\nC : (B) : E"
+    renamed = "X : (~Z) : E\nY : (X) : E\nZ : (~Y)(X + Z) : E"
+    assert(symmetric_difference_graph_distance(netspec, renamed) == 16)
+    assert(isomorphism_graph_distance(netspec, renamed) == 0)
+    assert(isomorphism_graph_distance(netspec, renamed.replace("Y : (X)", "Y : (~X)")) == 2)
+    assert(isomorphism_graph_distance(netspec, "A : (A) : E") == 6)
+    assert(isomorphism_graph_distance(netspec, "A : (A) : E", normalized=True) == 6 / 10)
+    assert(isomorphism_graph_distance(netspec, "A : (A) : E", upper_bound=5) is None)
+    assert(isomorphism_graph_distance(netspec, "A : (A) : E", normalized=True, upper_bound=0.6) == 0.6)
+    assert(isomorphism_graph_distance("", "") == 0)
+    # compare with brute force over all relabelings of small random networks
+    random.seed(5)
+
+    def relabel(netspec, names):
+        return "\n".join(line.translate(str.maketrans(dict(zip("ABCD", names)))) for line in netspec.split("\n"))
+
+    for _ in range(15):
+        a = random_netspec("ABCD"[:random.randint(1, 4)])
+        b = random_netspec("ABCD"[:random.randint(1, 4)])
+        expected = min(symmetric_difference_graph_distance(a, relabel(b, p)) for p in itertools.permutations("ABCDEFGH", 4))
+        assert(isomorphism_graph_distance(a, b) == expected)
+        assert(isomorphism_graph_distance(a, b, upper_bound=expected) == expected)
+        assert(isomorphism_graph_distance(a, b, upper_bound=expected - 1) is None)
+
+
+def test_parallel_distance_matrix():
+    import os, tempfile
+    import numpy as np
+    from dsgrn_utilities.network_distance import distance_matrix, parallel_distance_matrix, isomorphism_graph_distance
+    networks = netspecs + ["", "A : (A) : E", "B : (~B) : E"]
+    with tempfile.TemporaryDirectory() as d:
+        outfile = os.path.join(d, "distances.npy")
+        D = parallel_distance_matrix(networks, outfile, tile_size=3, processes=2)
+        assert(np.array_equal(D, distance_matrix(networks, condensed=True)))
+        # an interrupted job only recomputes the tiles missing from the sidecar file
+        with open(outfile + ".done") as f:
+            lines = f.readlines()
+        assert(len(lines) == 1 + 6)
+        with open(outfile + ".done", "w") as f:
+            f.writelines(lines[:4])
+        np.save(outfile, np.zeros(len(D), dtype=np.int64))
+        D = parallel_distance_matrix(networks, outfile, tile_size=3, processes=2)
+        N = len(networks)
+        pairs = [(i, j) for i in range(N) for j in range(i + 1, N)]
+        kept = set(tuple(map(int, line.split())) for line in lines[1:4])
+        expected = [0 if (i // 3 * 3, j // 3 * 3) in kept else d for (i, j), d in zip(pairs, distance_matrix(networks, condensed=True))]
+        assert(list(D) == expected)
+        assert(len(open(outfile + ".done").readlines()) == 7)
+        try:
+            parallel_distance_matrix(networks, outfile, normalized=True, tile_size=3)
+            assert(False)
+        except ValueError:
+            pass
+        D = parallel_distance_matrix(networks, os.path.join(d, "iso.npy"), metric=isomorphism_graph_distance, tile_size=2)
+        assert(list(D) == [isomorphism_graph_distance(networks[i], networks[j]) for (i, j) in pairs])
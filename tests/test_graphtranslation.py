@@ -1,3 +1,4 @@
+import io, os, tempfile
 import dsgrn_utilities.graphtranslation as gt
 
 def test():
@@ -7,3 +8,213 @@ def test():
     netspec = "Z : (~x) : E\nx : (y)(~Z) : E\ny : (y) : E"
     assert(netspec == gt.createEssentialNetworkSpecFromGraph(gt.getGraphFromNetworkSpec(netspec)))
     assert(netspec == gt.nxgraph2netspec(gt.netspec2nxgraph(netspec)))
+
+
+def test_predecessors():
+    netspec = "A : (A + B)(~C) : E\nB : (B)(~A) : E\nC : (A) : E"
+    g = gt.getGraphFromNetworkSpec(netspec)
+    assert(sorted(g.inedges(0)) == [0, 1, 2])
+    assert(sorted(g.inedges(2)) == [0])
+    h = g.transpose()
+    assert(sorted(h.adjacencies(0)) == [0, 1, 2])
+    assert(sorted(h.inedges(0)) == [0, 1, 2])
+    assert(h.edge_label(0, 2) == 'r')
+    assert(set(h.transpose().edges()) == set(g.edges()))
+    g.remove_vertex(0)
+    assert(sorted(g.vertices()) == [1, 2])
+    assert(g.inedges(1) == [1])
+    assert(g.inedges(2) == [])
+    assert(g.edges() == [(1, 1)])
+    assert(g.edge_labels_[2] == {})
+
+
+def test_labels():
+    g = gt.getGraphFromNetworkSpec("A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E")
+    assert(g.get_vertex_from_label("B") == 1)
+    assert(g.get_vertex_from_label("D") is None)
+    try:
+        g.add_vertex(3, "A")
+        assert(False)
+    except ValueError:
+        pass
+    assert(g.size() == 3)
+    g.set_vertex_label(1, "D")
+    assert(g.get_vertex_from_label("B") is None)
+    assert(g.get_vertex_from_label("D") == 1)
+    assert(g.transpose().get_vertex_from_label("D") == 1)
+    g.remove_vertex(1)
+    assert(g.get_vertex_from_label("D") is None)
+    g.add_vertex(3, "D")
+    assert(g.get_vertex_from_label("D") == 3)
+    # unlabeled vertices are allowed, but cannot be looked up
+    g.add_edge(4, 5)
+    try:
+        g.get_vertex_from_label("")
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_parse():
+    nodes = gt.parseNetworkSpec("A : (A + B)(~C) : E\n\nB : B ~ A\nC : A+C\n. comment\nD : (A)*(~ B)\nE :")
+    assert(nodes == [("A", [[("A", 'a'), ("B", 'a')], [("C", 'r')]], True),
+                     ("B", [[("B", 'a')], [("A", 'r')]], False),
+                     ("C", [[("A", 'a'), ("C", 'a')]], False),
+                     ("D", [[("A", 'a')], [("B", 'r')]], False),
+                     ("E", [], False)])
+    g = gt.getGraphFromNetworkSpec("x : ~y : E\ny : x + z\nz :")
+    assert(sorted((g.vertex_label(u), g.vertex_label(v), g.edge_label(u, v)) for (u, v) in g.edges()) ==
+           [("x", "y", 'a'), ("y", "x", 'r'), ("z", "y", 'a')])
+
+
+def test_iter_specs():
+    netspecs = ["A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E", "Z : (~x) : E\nx : (y)(~Z) : E\ny : (y) : E"]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "networks.txt")
+        with open(filename, "w") as f:
+            f.write("\n\n".join(netspecs) + "\n\n\n")
+        graphs = list(gt.iterGraphsFromNetworkSpecs(filename))
+        assert([gt.createEssentialNetworkSpecFromGraph(g) for g in graphs] == netspecs)
+    specs = list(gt.iterNetworkSpecs("2D_Example_A.db"))
+    assert(len(specs) == 1)
+    assert(gt.getGraphFromNetworkSpec(specs[0]).size() == 2)
+
+
+def test_clone_and_overlay():
+    netspec = "A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E"
+    g = gt.getGraphFromNetworkSpec(netspec)
+    h = g.clone()
+    h.remove_vertex(0)
+    assert(gt.createEssentialNetworkSpecFromGraph(g) == netspec)
+    # the same edits on an overlay and on a clone give the same graph, and leave the base alone
+    o = g.overlay()
+    c = g.clone()
+    for G in (o, c):
+        G.add_edge(2, 1, 'r')
+        G.remove_edge(0, 0)
+        G.add_edge(3, 2, 'a')
+        G.set_vertex_label(3, "D")
+        G.remove_vertex(1)
+    assert(gt.createEssentialNetworkSpecFromGraph(o) == gt.createEssentialNetworkSpecFromGraph(c) ==
+           "A :  : E\nC : (A + D) : E\nD :  : E")
+    assert(gt.createEssentialNetworkSpecFromGraph(g) == netspec)
+    assert(o.size() == c.size() == 3)
+    assert(o.get_vertex_from_label("D") == 3)
+    assert(o.get_vertex_from_label("B") is None)
+    assert(sorted(o.transpose().adjacencies(2)) == [0, 3])
+    assert(set(o.materialize().edges()) == set(c.edges()))
+    # a single-edge edit only copies the endpoints of the edge
+    o = g.overlay()
+    o.add_edge(2, 1, 'r')
+    assert(set(o.out_) == {1, 2})
+    assert(o.vertices() is g.vertices())
+    o2 = o.clone()
+    o2.remove_edge(2, 1)
+    assert(set(o.edges()) == set(g.edges()) | {(2, 1)})
+    assert(set(o2.edges()) == set(g.edges()))
+    # overlays of overlays layer their edits on the overlay below
+    o3 = o.overlay()
+    o3.remove_vertex(2)
+    o3.set_vertex_label(3, "D")
+    assert(set(o.edges()) == set(g.edges()) | {(2, 1)})
+    assert(2 not in o3.vertices() and o3.get_vertex_from_label("D") == 3)
+    assert(set(o3.edges()) == {e for e in o.edges() if 2 not in e})
+    assert(set(o3.overlay().materialize().edges()) == set(o3.edges()))
+
+
+def test_csr():
+    netspec = "A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E"
+    c = gt.CSRGraph.from_netspec(netspec)
+    assert(c.size() == 3 and c.num_edges() == 5)
+    assert(c.to_netspec() == netspec)
+    assert(gt.CSRGraph.from_graph(gt.getGraphFromNetworkSpec(netspec)).to_netspec() == netspec)
+    assert(gt.CSRGraph.from_nxgraph(c.to_nxgraph()).to_netspec() == netspec)
+    assert(c.out_degree().tolist() == [3, 2, 0])
+    assert(c.in_degree().tolist() == [2, 2, 1])
+    assert([d.tolist() for d in c.signed_degrees()] == [[2, 1, 1], [0, 1, 0], [2, 2, 0], [1, 0, 0]])
+    assert(c.adjacencies(0).tolist() == [0, 1, 2])
+    assert(c.has_edges([0, 1, 2, 2], [1, 0, 0, 2]).tolist() == [True, True, False, False])
+    assert(c.edge_signs([0, 1, 2], [1, 0, 0]).tolist() == [-1, 1, 0])
+    assert(c.edge_label(0, 1) == 'r')
+    try:
+        c.labels_ = ()
+        assert(False)
+    except AttributeError:
+        pass
+    # vertices that are not 0, ..., n-1 survive the round trip
+    g = gt.Graph()
+    g.add_vertex("x", "X")
+    g.add_edge("y", "x", 'r')
+    g.set_vertex_label("y", "Y")
+    h = gt.CSRGraph.from_graph(g).to_graph()
+    assert(h.edges() == [("y", "x")] and h.edge_label("y", "x") == 'r' and h.vertex_label("y") == "Y")
+    assert(gt.CSRGraph.from_netspec("").size() == 0)
+    assert(gt.CSRGraph.from_netspec("A :").edge_signs([0], [0]).tolist() == [0])
+
+
+def test_nxview():
+    import networkx as nx
+    netspec = "A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E"
+    g = gt.getGraphFromNetworkSpec(netspec)
+    assert(nx.utils.graphs_equal(gt.netspec2nxgraph(netspec), gt.graph2nxgraph(g)))
+    view = gt.graph2nxview(g)
+    assert(nx.utils.graphs_equal(view, gt.graph2nxgraph(g)))
+    assert(gt.nxgraph2netspec(view) == netspec)
+    assert([sorted(c) for c in nx.strongly_connected_components(view)] == [[2], [0, 1]])
+    assert(view.pred[1][0]["label"] == 'r')
+    # the view follows edits to the graph and cannot be edited itself
+    g.add_edge(2, 1, 'a')
+    assert(nx.shortest_path(view, 2, 1) == [2, 1])
+    try:
+        view.add_edge(1, 2)
+        assert(False)
+    except nx.NetworkXError:
+        pass
+    # views of edited overlays look vertices up without building the vertex set, so vertices() is never called
+    o = g.overlay()
+    o.add_vertex(3, "D")
+    o.add_edge(3, 0, 'r')
+    o.remove_vertex(1)
+    o.vertices = None
+    view = gt.graph2nxview(o)
+    assert(3 in view and 1 not in view and view.nodes[3]["label"] == "D")
+    assert(view.pred[0][3]["label"] == 'r' and 0 in view.succ[3])
+
+
+def test_hash():
+    netspec = "A : (A + B)(~C) : E\nB : (B)(~A) : E\nC : (A) : E"
+    same = "C : A : E\n\nB : (~A) (B) : E\nA : (~C)(B+A) : E"
+    assert(gt.canonicalNetworkHash(netspec) == gt.canonicalNetworkHash(same))
+    assert(gt.canonicalNetworkHash(netspec) != gt.canonicalNetworkHash(netspec.replace("(B)(~A) : E", "(B)(~A)")))
+    assert(gt.canonicalNetworkHash(netspec) != gt.canonicalNetworkHash(netspec.replace("(A + B)", "(A)(B)")))
+    g = gt.getGraphFromNetworkSpec(netspec)
+    assert(gt.canonicalNetworkHash(g) == gt.canonicalNetworkHash(gt.createEssentialNetworkSpecFromGraph(g)))
+    # renaming nodes changes only the name-sensitive hash
+    renamed = "X : (X + Y)(~Z) : E\nY : (Y)(~X) : E\nZ : (X) : E"
+    assert(gt.canonicalNetworkHash(netspec) != gt.canonicalNetworkHash(renamed))
+    assert(gt.canonicalNetworkHash(netspec, True) == gt.canonicalNetworkHash(renamed, True))
+    assert(gt.canonicalNetworkHash(netspec, True) != gt.canonicalNetworkHash(renamed.replace("(~X)", "(X)"), True))
+    assert(gt.uniqueNetworkSpecs([netspec, same, renamed]) == [netspec, renamed])
+    assert(gt.uniqueNetworkSpecs([netspec, same, renamed], isomorphism=True) == [netspec])
+
+
+def test_streaming_serialization():
+    netspecs = ["A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E", "Z : (~x) : E\nx : (y)(~Z) : E\ny : (y) : E"]
+    graphs = [gt.getGraphFromNetworkSpec(n) for n in netspecs]
+    f = io.StringIO()
+    gt.writeGraphviz(graphs, f)
+    gt.writeGraphviz(graphs[0], f)
+    assert(f.getvalue() == graphs[0].graphviz() + graphs[1].graphviz() + graphs[0].graphviz())
+    f.seek(0)
+    assert([gt.createEssentialNetworkSpecFromGraph(g) for g in gt.readGraphviz(f)] == netspecs + netspecs[:1])
+    # non-ASCII labels are written as they are, not as escape sequences
+    g = gt.getGraphFromNetworkSpec("α : (α) : E")
+    assert('[label="α"]' in g.graphviz())
+    assert(gt.createEssentialNetworkSpecFromGraph(next(gt.readGraphviz(io.StringIO(g.graphviz())))) == "α : (α) : E")
+    f = io.StringIO()
+    gt.writeJSONLines(iter(graphs), f)
+    assert(len(f.getvalue().splitlines()) == 2)
+    f.seek(0)
+    read = list(gt.readJSONLines(f))
+    assert([gt.createEssentialNetworkSpecFromGraph(g) for g in read] == netspecs)
+    assert(set(read[1].edges()) == set(graphs[1].edges()))
@@ -0,0 +1,65 @@
+import os, tempfile
+import numpy as np
+from dsgrn_utilities.hillmodel import hillmodel, loadTrajectory
+
+toggle_switch = "X : ~Y : E\nY : ~X : E"
+toggle_parameter = {"L[X, Y]" : 0.5, "U[X, Y]" : 2.0, "T[X, Y]" : 1.0, "L[Y, X]" : 0.5, "U[Y, X]" : 2.0, "T[Y, X]" : 1.0}
+
+
+def test_streaming():
+    model = hillmodel(toggle_switch, toggle_parameter, 10)
+    times, timeseries, varnames = model.simulateHillModel([1.5, 0.8], 0, 20, 0.1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        outfile = os.path.join(tmpdir, "trajectory.npy")
+        # a chunk size that does not divide the number of time steps
+        stimes, stimeseries, svarnames = model.simulateHillModel([1.5, 0.8], 0, 20, 0.1, outfile=outfile, chunksize=7)
+        assert(svarnames == varnames == ["X", "Y"])
+        assert(stimeseries.shape == (len(times), 2))
+        assert(np.allclose(stimes, times))
+        assert(np.allclose(stimeseries, timeseries))
+        ltimes, ltimeseries = loadTrajectory(outfile)
+        assert(isinstance(ltimeseries, np.memmap))
+        assert(np.array_equal(ltimes, stimes))
+        del stimes, stimeseries, ltimes, ltimeseries
+
+
+def test_equilibria():
+    model = hillmodel(toggle_switch, toggle_parameter, 10)
+    # the production bounds are only computed when findEquilibria needs them
+    assert(model._maxproduction is None)
+    equilibria, stability = model.findEquilibria(stability=True, seed=0)
+    assert(model._maxproduction is not None and len(model.maxproduction) == 2)
+    assert(equilibria.shape == (3, 2))
+    assert(stability == ["stable", "unstable", "stable"])
+    # the symmetric equilibrium is the saddle
+    assert(np.allclose(equilibria[1, 0], equilibria[1, 1]))
+    # the stable equilibria agree with the end point of a long simulation
+    times, timeseries, varnames = model.simulateHillModel([1.5, 0.8], 0, 50, 1.0)
+    assert(np.allclose(timeseries[-1], equilibria[2], atol=1e-4))
+    equilibria = model.findEquilibria(initialguesses=[[0.4, 2.1], [0.6, 1.9]])
+    assert(equilibria.shape == (1, 2))
+
+
+def test_extrema():
+    repressilator = "X : ~Z : E\nY : ~X : E\nZ : ~Y : E"
+    parameter = {}
+    for pair in ["[Z, X]", "[X, Y]", "[Y, Z]"]:
+        parameter.update({"L" + pair : 0.5, "U" + pair : 2.0, "T" + pair : 1.0})
+    model = hillmodel(repressilator, parameter, 10)
+    times, timeseries, varnames, events = model.simulateExtrema([1.0, 1.5, 0.5], 0, 20)
+    assert(len(events) > 6)
+    assert(len(times) == len(timeseries) == len(events) + 2)
+    assert(times == sorted(times))
+    # extrema of each variable alternate between maxima and minima
+    for name in varnames:
+        kinds = [kind for (t, n, kind) in events if n == name]
+        assert(all(a != b for a, b in zip(kinds, kinds[1:])))
+    # the event times agree with the extrema of a densely sampled trajectory
+    dt = 0.001
+    dtimes, dseries, _ = model.simulateHillModel([1.0, 1.5, 0.5], 0, 20, dt)
+    x = np.array(dseries)[:, 0]
+    interior = np.arange(1, len(x) - 1)
+    dense_maxima = [dtimes[i] for i in interior if x[i] > x[i - 1] and x[i] >= x[i + 1]]
+    maxima = [t for (t, n, kind) in events if n == "X" and kind == "max"]
+    assert(len(maxima) == len(dense_maxima))
+    assert(np.allclose(maxima, dense_maxima, atol=10 * dt))
@@ -0,0 +1,39 @@
+import subprocess, sys
+
+
+def import_in_subprocess(module):
+    # import the module in a fresh interpreter and report which heavy dependencies it loaded; numpy is not one of
+    # them, since modules with numpy-based classes import it once at the top
+    code = "import sys\n" \
+           "import {}\n".format(module) + \
+           "heavy = ['networkx','scipy','matplotlib','min_interval_posets','DSGRN']\n" \
+           "print(','.join(h for h in heavy if h in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+    return [m for m in out.split(",") if m]
+
+
+def test_package_import():
+    assert(import_in_subprocess("dsgrn_utilities") == [])
+
+
+def test_submodule_import():
+    for module in ["network_distance", "graphtranslation", "hillmodel", "parameter_building", "network_store"]:
+        assert(import_in_subprocess("dsgrn_utilities." + module) == [])
+
+
+def test_hex_helpers_without_dsgrn():
+    # the hex code helpers of parameter_building work without importing DSGRN
+    code = "import sys\n" \
+           "import dsgrn_utilities.parameter_building as buildparam\n" \
+           "assert(buildparam.format_hex(0xfc0,3) == 'FC0')\n" \
+           "assert(list(buildparam.parse_hex(['FC0','0'])) == [4032,0])\n" \
+           "assert(list(buildparam.format_hex_array([4032,0],3)) == ['FC0','000'])\n" \
+           "print('DSGRN' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert(out.strip() == "False")
+
+
+def test_lazy_attribute():
+    import dsgrn_utilities
+    assert(dsgrn_utilities.graphtranslation.Graph().size() == 0)
+    assert("network_distance" in dir(dsgrn_utilities))
@@ -0,0 +1,73 @@
+import threading
+import dsgrn_utilities.graphtranslation as gt
+from dsgrn_utilities import network_cache
+from dsgrn_utilities.network_cache import LRUCache
+from dsgrn_utilities.network_distance import symmetric_difference_graph_distance
+from dsgrn_utilities.hillmodel import hillmodel
+
+
+def test_lru():
+    cache = LRUCache(maxsize=2)
+    calls = []
+    compute = lambda k : (lambda : calls.append(k) or k.upper())
+    assert(cache.get_or_compute("a", compute("a")) == "A")
+    assert(cache.get_or_compute("b", compute("b")) == "B")
+    assert(cache.get_or_compute("a", compute("a")) == "A")
+    cache.get_or_compute("c", compute("c"))   # evicts b, the least recently used
+    cache.get_or_compute("b", compute("b"))
+    assert(calls == ["a", "b", "c", "b"])
+    assert(cache.info() == {"hits": 1, "misses": 4, "evictions": 2, "size": 2, "maxsize": 2})
+    cache.resize(1)
+    assert(cache.info()["size"] == 1 and cache.info()["evictions"] == 3)
+    cache.clear()
+    assert(cache.info() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 1})
+
+
+def test_threads():
+    cache = LRUCache(maxsize=50)
+    results = []
+
+    def work():
+        results.extend(cache.get_or_compute(k % 100, lambda : k % 100) == k % 100 for k in range(1000))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    info = cache.info()
+    assert(all(results) and info["size"] == 50 and info["hits"] + info["misses"] == 8000)
+
+
+def test_shared():
+    netspec = "A : (A + B) : E\nB : (~A) : E"
+    network_cache.cache.clear()
+    g = gt.getGraphFromNetworkSpec(netspec)
+    g.remove_edge(0, 1)
+    # callers get copies, so mutating one does not change the cached graph
+    assert(set(gt.getGraphFromNetworkSpec(netspec).edges()) == {(0, 0), (1, 0), (0, 1)})
+    assert(gt.getGraphFromNetworkSpec(netspec).edge_label(0, 1) == 'r')
+    assert(network_cache.cache.info()["hits"] == 2)
+    assert(symmetric_difference_graph_distance(netspec, netspec) == 0)
+    assert(symmetric_difference_graph_distance(netspec, "A : (A) : E") == 3)
+    parameter = {kind + edge: value for edge in ["[A, A]", "[B, A]", "[A, B]"] for kind, value in zip("LUT", [1, 2, 1.5])}
+    h = hillmodel(netspec, parameter, 10)
+    h.varnames.append("C")
+    assert(hillmodel(netspec, parameter, 10).varnames == ["A", "B"])
+    assert(network_cache.cache.info()["size"] == 4)
+
+
+def test_streaming_bypasses_cache():
+    import os, tempfile
+    from dsgrn_utilities.network_distance import encode_networks, NetworkIndex, DistanceTracker
+    from dsgrn_utilities.network_store import write_network_store
+    netspecs = ["A : (A) : E", "A : (A + B) : E\nB : (~A) : E", "A : (~B) : E\nB : (A) : E"]
+    network_cache.cache.clear()
+    encode_networks(netspecs)
+    NetworkIndex(netspecs)
+    DistanceTracker(netspecs[0], netspecs)
+    with tempfile.TemporaryDirectory() as d:
+        write_network_store(os.path.join(d, "store"), netspecs)
+    assert(set(gt.getGraphFromNetworkSpec(netspecs[1], cached=False).edges()) == {(0, 0), (1, 0), (0, 1)})
+    # only the starting network of the tracker goes through the cache
+    assert(network_cache.cache.info()["size"] == 1)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import dsgrn_utilities.graphtranslation as gt
+from dsgrn_utilities.network_store import write_network_store, NetworkStore
+
+
+def test():
+    netspecs = ["A : (A + B) : E\nB : (B)(~A) : E\nC : (A) : E", "Z : (~x) : E\nx : (y)(~Z) : E\ny : (y) : E", "A : (A) : E"]
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "networks.store")
+        graphs = [gt.getGraphFromNetworkSpec(netspecs[0])] + netspecs[1:]
+        assert(write_network_store(path, iter(graphs)) == 3)
+        store = NetworkStore(path)
+        assert(len(store) == 3)
+        assert([store.netspec(i) for i in range(3)] == netspecs)
+        assert([gt.createEssentialNetworkSpecFromGraph(g) for g in store] == netspecs)
+        assert(store.labels(1) == ["Z", "x", "y"])
+        # labels shared between networks are stored once
+        assert(len(store.label_offsets_) == 7)
+        csr = store.csr(1)
+        assert(csr.edge_label(1, 0) == 'r' and csr.edge_label(2, 1) == 'a' and csr.num_edges() == 4)
+        assert(store[2].edges() == [(0, 0)])
+        try:
+            store.labels(3)
+            assert(False)
+        except IndexError:
+            pass
+        assert(write_network_store(os.path.join(d, "empty.store"), []) == 0)
+        assert(len(NetworkStore(os.path.join(d, "empty.store"))) == 0)
+
+
+def test_npy_appender():
+    import numpy as np
+    from dsgrn_utilities.npy_appender import NpyAppender
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, "rows.npy")
+        with NpyAppender(filename, np.float64, (3,)) as a:
+            a.append(np.arange(6).reshape(2, 3))
+            a.append([])
+            a.append([6, 7, 8])
+        assert(np.array_equal(np.load(filename, mmap_mode='r'), np.arange(9).reshape(3, 3)))
+        NpyAppender(filename, np.int8).close()
+        assert(np.load(filename).shape == (0,))
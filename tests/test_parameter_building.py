@@ -68,3 +68,77 @@ def test4():
     assert(build.index2name(network,build.name2index(network,"B")) == "B")
     assert(build.index2name(network,build.name2index(network,"C")) == "C")
 
+
+
+def test_template():
+    network_spec = "A : A + B\nB : (B)(~A)\nC : A"
+    network = DSGRN.Network(network_spec)
+    template = build.NetworkTemplate(network)
+    assert(template.num_inedges_ == (2,2,1) and template.num_outedges_ == (3,2,1))
+    pg = DSGRN.ParameterGraph(network)
+    rows = [(["000","00","0"],[[0,1,2],[0,1],[0]]), (["FD9","40","0"],[[2,1,0],[1,0],[0]])]
+    params = template.parameters(rows)
+    for (hex_codes,orders),param in zip(rows,params):
+        assert(pg.index(param) == pg.index(build.construct_parameter(network,hex_codes,orders)))
+    assert(pg.index(params[0]) == 0)
+
+
+def test_interning():
+    assert(build.logic_parameter(2,3,"FD9") is build.logic_parameter(2,3,"FD9"))
+    assert(build.logic_parameter(2,3,"FD9") is not build.logic_parameter(2,2,"FD9"))
+    assert(build.order_parameter([1,0,2]) is build.order_parameter((1,0,2)))
+    assert(build.order_parameter([1,0,2]).permutation() == [1,0,2])
+    # parameters sharing logic and order objects stay independent
+    network = DSGRN.Network("A : A + B\nB : (B)(~A)\nC : A")
+    pg = DSGRN.ParameterGraph(network)
+    p1 = build.construct_parameter(network,["FD9","40","0"],[[2,1,0],[1,0],[0]])
+    p2 = build.construct_parameter(network,["FD9","00","0"],[[2,1,0],[1,0],[0]])
+    assert(pg.index(p1) != pg.index(p2))
+    assert(p1.logic()[1].hex() == "40" and p2.logic()[1].hex() == "00")
+
+
+def test_query():
+    network = DSGRN.Network("A : A + B\nB : (B)(~A)\nC : (~A)(B) : E")
+    pg = DSGRN.ParameterGraph(network)
+    hex_constraints = {0 : ["FD9","000","FFF"], 2 : ["8"]}
+    order_constraints = {0 : [[2,1,0],[0,1,2]]}
+    expected = [i for i in range(pg.size()) if build.specify_hex_list(pg.parameter(i),0,hex_constraints[0])
+                and build.specify_hex_eq(pg.parameter(i),2,"8") and build.specify_order_list(pg.parameter(i),0,order_constraints[0])]
+    assert(expected)
+    assert(list(build.query_parameter_indices(pg,hex_constraints,order_constraints)) == expected)
+    assert(list(build.query_parameter_indices(pg)) == list(range(pg.size())))
+    assert(list(build.query_parameter_indices(pg,{1 : ["nope"]})) == [])
+    # hex codes given as integers, arrays of integers or lower case strings select the same parameters
+    fd9 = list(build.query_parameter_indices(pg,{0 : ["FD9"]}))
+    assert(len(fd9) == 3600)
+    for codes in [[0xFD9],build.parse_hex(["FD9"]),["fd9"],["0xFD9","nope"]]:
+        assert(list(build.query_parameter_indices(pg,{0 : codes})) == fd9)
+        assert(all(build.specify_hex_list(pg.parameter(i),0,codes) for i in fd9[:20]))
+    others = [i for i in range(200) if i not in set(fd9)]
+    assert(others and not any(build.specify_hex_list(pg.parameter(i),0,["fd9",0xFD9]) for i in others))
+
+
+def test_integer_hex():
+    import numpy as np
+    assert(build.format_hex("0xfc0",3) == "FC0" and build.format_hex(0,3) == "000" and build.format_hex(0xFC0,3) == "FC0")
+    codes = build.parse_hex(["FC0","0","00A"])
+    assert(codes.dtype == np.uint64 and list(codes) == [0xFC0,0,10])
+    assert(list(build.format_hex_array(codes,3)) == ["FC0","000","00A"])
+    assert(list(build.format_hex_array([2**64-1],16)) == ["F"*16] and list(build.parse_hex(["F"*16])) == [2**64-1])
+    assert(build.parse_hex([]).shape == (0,))
+    for bad in [["ZZ"],["F","1G"],[""]]:
+        try:
+            build.parse_hex(bad)
+            assert(False)
+        except ValueError:
+            pass
+    wide = build.parse_hex(["1" + "0"*19])
+    assert(wide.dtype == object and wide[0] == 16**19)
+    assert(list(build.format_hex_array(wide,20)) == ["1" + "0"*19])
+    network = DSGRN.Network("A : A + B\nB : (B)(~A)\nC : A")
+    param = build.construct_parameter(network,["FD9","40","0"],[[2,1,0],[1,0],[0]])
+    assert(build.specify_hex_eq(param,0,0xFD9) and not build.specify_hex_eq(param,0,0xFD8))
+    assert(build.specify_hex_list(param,1,[0x40,0]) and build.specify_hex_list(param,1,build.parse_hex(["00","40"])))
+    assert(not build.specify_hex_list(param,1,np.array([1,2],dtype=np.uint64)))
+    assert(build.specify_hex_list(param,0,np.array(["FD9"])) and build.specify_hex_list(param,0,build.format_hex_array([0xFD9],3)))
+    assert(not build.specify_hex_list(param,0,build.format_hex_array([0xFD8],3)))
@@ -0,0 +1,49 @@
+import DSGRN, json, re
+import dsgrn_utilities.parameter_building as build
+from dsgrn_utilities.sample_hill_parameters import sample_hill_parameters
+from dsgrn_utilities.hillmodel import hillmodel
+
+
+def satisfies_inequalities(parameter, sample):
+    # evaluate the DSGRN inequalities of the parameter, written as e.g. "L[Y->X] (L[X->X] + L[Z->X]) < T[X->Y]"
+    inequalities = json.loads(parameter.inequalities())["inequalities"].split(" && ")
+    # skip the fake thresholds "T[C->]" of nodes without out-edges, which are not sampled
+    for ineq in [i for i in inequalities if "->]" not in i]:
+        expr = re.sub(r"([LUT])\[(\w+)->(\w+)\]", lambda m: "s['{}[{}, {}]']".format(*m.groups()), ineq)
+        expr = re.sub(r"([\])])\s+(?=[s(])", r"\1 * ", expr)
+        if not eval(expr, {"s": sample}):
+            return False
+    return True
+
+
+def test1():
+    network = DSGRN.Network("X : (X + Z)(~Y) : E\nY : (X) : E\nZ : (X)(Y)")
+    pg = DSGRN.ParameterGraph(network)
+    for pi in [0, 123, 7777, 20000, pg.size() - 1]:
+        names, samples = sample_hill_parameters(pg.parameter(pi), 200, seed=pi)
+        assert(samples.shape == (200, 18))
+        assert(len(set(names)) == 18)
+        assert(all(satisfies_inequalities(pg.parameter(pi), dict(zip(names, row))) for row in samples))
+
+
+def test2():
+    # no out-edges on C; the fake threshold is not a Hill parameter
+    network = DSGRN.Network("A : (~B) : E\nB : (A) : E\nC : (A)(B) : E")
+    param = build.construct_parameter(network, ["2", "2", "8"], [[1, 0], [0, 1], [0]])
+    names, samples = sample_hill_parameters(param, 50, seed=0)
+    assert(sorted(names) == sorted(["L[B, A]", "U[B, A]", "T[A, B]", "T[A, C]", "L[A, B]", "U[A, B]", "T[B, A]",
+                                    "T[B, C]", "L[A, C]", "U[A, C]", "L[B, C]", "U[B, C]"]))
+    assert(all(satisfies_inequalities(param, dict(zip(names, row))) for row in samples))
+    names, samples = sample_hill_parameters(param, 5, seed=0, old_format=False)
+    model = hillmodel(network.specification(), dict(zip(names, samples[0])), 10, old_format=False)
+    assert(model.dim() == 3)
+
+
+def test3():
+    # X has four inputs; its region for this parameter is too thin for rejection sampling alone
+    network = DSGRN.Network("X : (X + Y + Z)(~W) : E\nY : (X) : E\nZ : (X) : E\nW : (X) : E")
+    param = DSGRN.ParameterGraph(network).parameter(5124491)
+    for max_batches in [10, 0]:
+        names, samples = sample_hill_parameters(param, 100, seed=1, max_batches=max_batches)
+        assert(samples.shape == (100, 21))
+        assert(all(satisfies_inequalities(param, dict(zip(names, row))) for row in samples))